@@ -12,7 +12,9 @@ from django.urls import reverse
 from django.utils import timezone
 from django.contrib import auth
 from django.template import loader
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from .recommendation_cache import cache_stats
+from .recommendation_engines import engines
 
 # Admin credentials
 ADMIN_USERNAME = "admin"
@@ -264,6 +266,12 @@ def admin_users(request):
         'current_user_id': request.user.id
     })
 
+@admin_login_required
+def recommendation_stats(request):
+    """Result cache hit/miss counters (shared by every worker using the cache)
+    and this worker's per-engine latency histograms"""
+    return JsonResponse({'result_cache': cache_stats(), 'engines': engines.stats()})
+
 def admin_error_handler(request, exception=None):
     template = loader.get_template('admin/error.html')
     status = 500
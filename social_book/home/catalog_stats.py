@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+# Titles need at least this many ratings to be listed as top rated
+DEFAULT_MIN_RATINGS = 5
+
+
+def split_genres(values):
+    """One entry per (row, genre): dataset genres are '|'-separated, site books' comma-separated"""
+    genres = (
+        pd.Series(np.asarray(values, dtype=object)).dropna().astype(str)
+        .str.split(r'[,|]', regex=True)
+        .explode()
+        .str.strip()
+    )
+    return genres[genres != '']
+
+
+class CatalogStats:
+    """Catalog aggregates behind the chatbot's genre, author and rating answers.
+
+    Built once per model snapshot so answering a question is a list slice
+    instead of a scan over the dataset.
+    """
+
+    def __init__(self, df, min_ratings=DEFAULT_MIN_RATINGS, top=20):
+        self.genre_counts = split_genres(df['Genres']).value_counts().head(top)
+        self.author_counts = df['Author'].value_counts().head(top)
+
+        # Rating_Mean/Rating_Count cover every rating of a book in the raw CSV,
+        # not just the one row kept after deduplication
+        totals = (df['Rating_Mean'] * df['Rating_Count']).groupby(df['Title']).sum()
+        counts = df.groupby('Title')['Rating_Count'].sum()
+        rated = pd.DataFrame({'mean': totals / counts, 'count': counts})
+        rated = rated[rated['count'] >= min_ratings]
+        self.top_rated = rated.sort_values(['mean', 'count'], ascending=False)['mean'].head(top)
+
+    def top_genres(self, n=5):
+        return self.genre_counts.index[:n].tolist()
+
+    def top_authors(self, n=5):
+        return self.author_counts.index[:n].tolist()
+
+    def top_rated_titles(self, n=5):
+        return self.top_rated.index[:n].tolist()
+
+
+class PopularityRanking:
+    """Books ranked by Bayesian-averaged rating x rating count, overall and per genre.
+
+    The average shrinks each book's mean towards the catalog mean with
+    `prior` pseudo-ratings (default: the mean rating count), so a single
+    5-star rating doesn't outrank a well-reviewed classic. Only the first
+    row of each title is kept. Fallbacks read the head of these arrays.
+    """
+
+    def __init__(self, df, title_group, prior=None, rotation_window=4):
+        counts = df['Rating_Count'].to_numpy(dtype=np.float64)
+        means = df['Rating_Mean'].to_numpy(dtype=np.float64)
+        prior = prior if prior is not None else counts.mean()
+        catalog_mean = (means * counts).sum() / counts.sum() if counts.sum() else 0.0
+        # No ratings at all (e.g. only live books) leaves 0/0; those books score 0
+        weight = prior + counts
+        bayes = np.divide(prior * catalog_mean + means * counts, weight, out=np.zeros_like(weight), where=weight > 0)
+        score = bayes * counts
+
+        order = np.argsort(-score, kind='stable')
+        _, first = np.unique(title_group[order], return_index=True)
+        self.rows = order[np.sort(first)].astype(np.int32)
+        self.scores = score[self.rows]
+        self.rotation_window = rotation_window
+
+        # Genre -> the ranked rows listing it, still in popularity order
+        genres = split_genres(df['Genres'].to_numpy(dtype=object)[self.rows])
+        codes, names = pd.factorize(genres.str.lower().to_numpy())
+        order = np.argsort(codes, kind='stable')
+        positions = genres.index.to_numpy()[order]
+        bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+        self.by_genre = {
+            name: self.rows[positions[bounds[i]:bounds[i + 1]]]
+            for i, name in enumerate(names)
+        }
+
+    def top(self, n, genre=None, seed=None, allowed=None):
+        """First n ranked rows, optionally for one genre.
+
+        A seed rotates the first n * rotation_window rows, so different
+        seeds (e.g. users) see different popular books while each seed
+        always gets the same answer. `allowed` is an optional boolean mask
+        over rows.
+        """
+        ranked = self.rows
+        if genre is not None:
+            ranked = self.by_genre.get(str(genre).strip().lower(), ranked[:0])
+        if allowed is not None:
+            ranked = ranked[allowed[ranked]]
+        if seed is not None and len(ranked):
+            window = ranked[:n * self.rotation_window]
+            ranked = np.roll(window, -(int(seed) % len(window)))
+        return ranked[:n]
+
+
+class GenreMatrix:
+    """Boolean rows x genres matrix, so genre filters are a column lookup"""
+
+    def __init__(self, df):
+        genres = split_genres(df['Genres'].to_numpy(dtype=object))
+        codes, names = pd.factorize(genres.str.lower().to_numpy())
+        self.columns = {name: i for i, name in enumerate(names)}
+        # Column-major so each genre's mask is contiguous
+        self.matrix = np.zeros((len(df), len(names)), dtype=bool, order='F')
+        self.matrix[genres.index.to_numpy(), codes] = True
+
+    def mask(self, genre):
+        """Rows listing `genre` (case-insensitive); all False for unknown genres"""
+        column = self.columns.get(str(genre).strip().lower())
+        if column is None:
+            return np.zeros(self.matrix.shape[0], dtype=bool)
+        return self.matrix[:, column]
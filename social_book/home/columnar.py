@@ -0,0 +1,81 @@
+"""Typed columnar storage for data frames: one .npy file per column.
+
+Numeric columns are stored with their (compact) dtype as-is. Text columns
+are dictionary encoded: an int32 codes array plus a JSON list of distinct
+values, read back either as a pandas categorical or as plain strings.
+Readers load only the columns they ask for.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+SCHEMA_NAME = 'columns.json'
+
+
+def _is_categorical(series):
+    return isinstance(series.dtype, pd.CategoricalDtype)
+
+
+def write_frame(df, directory, meta=None):
+    """Write `df` column by column into `directory` (replaced atomically)"""
+    tmp_dir = f'{directory}.tmp'
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    columns = {}
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        if _is_categorical(series) or not pd.api.types.is_numeric_dtype(series.dtype):
+            kind = 'category' if _is_categorical(series) else 'string'
+            codes, categories = pd.factorize(series, sort=True)
+            np.save(os.path.join(tmp_dir, f'{i}.npy'), codes.astype(np.int32))
+            with open(os.path.join(tmp_dir, f'{i}.categories.json'), 'w', encoding='utf-8') as f:
+                json.dump([str(value) for value in categories], f, ensure_ascii=False)
+        else:
+            kind = 'numeric'
+            np.save(os.path.join(tmp_dir, f'{i}.npy'), series.to_numpy())
+        columns[name] = {'file': i, 'kind': kind}
+
+    with open(os.path.join(tmp_dir, SCHEMA_NAME), 'w', encoding='utf-8') as f:
+        json.dump({'rows': len(df), 'columns': columns, 'meta': meta or {}}, f, indent=2)
+
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.rename(tmp_dir, directory)
+
+
+def read_schema(directory):
+    """Schema written by write_frame, or None if `directory` holds no frame"""
+    path = os.path.join(directory, SCHEMA_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_frame(directory, columns=None):
+    """Load `columns` (default: all) of a frame written by write_frame"""
+    schema = read_schema(directory)
+    if schema is None:
+        raise FileNotFoundError(f'No columnar frame in {directory}')
+    names = list(schema['columns']) if columns is None else list(columns)
+
+    data = {}
+    for name in names:
+        spec = schema['columns'][name]
+        values = np.load(os.path.join(directory, f"{spec['file']}.npy"))
+        if spec['kind'] == 'numeric':
+            data[name] = values
+            continue
+        with open(os.path.join(directory, f"{spec['file']}.categories.json"), encoding='utf-8') as f:
+            categories = json.load(f)
+        if spec['kind'] == 'category':
+            data[name] = pd.Categorical.from_codes(values, categories=categories)
+        else:
+            # Missing values (code -1) pick the trailing None
+            data[name] = np.array(categories + [None], dtype=object)[values]
+    return pd.DataFrame(data, columns=names)
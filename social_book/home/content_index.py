@@ -0,0 +1,280 @@
+import math
+
+import numpy as np
+from scipy import sparse
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+
+# Neighbors kept per book; enough headroom for title dedup and thresholding
+DEFAULT_NEIGHBORS = 50
+# Upper bound on the dense similarity block materialized at once
+MAX_BLOCK_BYTES = 64 * 1024 * 1024
+# Below this many books exact search is already fast enough
+ANN_MIN_ROWS = 20000
+
+
+def top_k(scores, k):
+    """Positions of the k largest scores, best first"""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+class ExactIndex:
+    """Brute-force cosine search over the full TF-IDF matrix.
+
+    Serves as the reference when measuring the recall of approximate
+    backends, and is the default for small catalogs.
+    """
+    backend = 'exact'
+
+    def __init__(self, matrix):
+        self.matrix = sparse.csr_matrix(matrix)
+
+    def search(self, vector, k):
+        """Top-k (indices, scores) for a single 1 x n_features query row"""
+        scores = np.asarray((self.matrix @ vector.T).todense()).ravel()
+        idx = top_k(scores, k)
+        return idx, scores[idx]
+
+    def extend(self, matrix):
+        """Index over `matrix`, whose leading rows are the ones already indexed"""
+        return ExactIndex(matrix)
+
+    def to_arrays(self):
+        return {}
+
+    @classmethod
+    def from_arrays(cls, matrix, arrays, **params):
+        return cls(matrix)
+
+
+class IVFIndex:
+    """Inverted-file ANN index over SVD-reduced TF-IDF vectors.
+
+    Books are clustered into `n_lists` cells with k-means on L2-normalized
+    reduced vectors. A query scores only the members of its `n_probe`
+    closest cells, so per-query work is about n_lists + n_probe * N / n_lists
+    (sublinear for n_lists ~ sqrt(N)). Raising `n_probe` trades latency for
+    recall; `rerank` rescores candidates on the exact sparse vectors.
+    """
+    backend = 'ivf'
+
+    def __init__(self, matrix, components, centroids, list_offsets, list_members,
+                 n_probe=8, rerank=True, reduced=None):
+        self.matrix = sparse.csr_matrix(matrix)
+        self.components = components
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_members = list_members
+        self.n_probe = n_probe
+        self.rerank = rerank
+        self.reduced = self._reduce(self.matrix) if reduced is None else reduced
+
+    @classmethod
+    def build(cls, matrix, n_lists=None, n_components=64, n_probe=8, rerank=True, random_state=42):
+        matrix = sparse.csr_matrix(matrix)
+        n_rows, n_features = matrix.shape
+        n_components = max(1, min(n_components, n_features - 1))
+        svd = TruncatedSVD(n_components=n_components, random_state=random_state)
+        svd.fit(matrix)
+        components = svd.components_.astype(np.float32)
+
+        reduced = normalize(np.asarray(matrix @ components.T))
+        n_lists = n_lists or max(1, int(math.sqrt(n_rows)))
+        n_lists = min(n_lists, n_rows)
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, random_state=random_state, n_init=3)
+        assignments = kmeans.fit_predict(reduced)
+        centroids = normalize(kmeans.cluster_centers_).astype(np.float32)
+
+        # CSR-style inverted lists: members of cell c are list_members[offsets[c]:offsets[c+1]]
+        list_members = np.argsort(assignments, kind='stable').astype(np.int32)
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=n_lists), out=list_offsets[1:])
+        return cls(matrix, components, centroids, list_offsets, list_members,
+                   n_probe=n_probe, rerank=rerank)
+
+    def _reduce(self, matrix):
+        return normalize(np.asarray(matrix @ self.components.T)).astype(np.float32)
+
+    def search(self, vector, k, n_probe=None):
+        """Approximate top-k (indices, scores) for a single 1 x n_features query row"""
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        query = self._reduce(sparse.csr_matrix(vector))[0]
+        cells = top_k(self.centroids @ query, n_probe)
+        candidates = np.concatenate([
+            self.list_members[self.list_offsets[c]:self.list_offsets[c + 1]] for c in cells
+        ])
+        if self.rerank:
+            scores = np.asarray((self.matrix[candidates] @ vector.T).todense()).ravel()
+        else:
+            scores = self.reduced[candidates] @ query
+        best = top_k(scores, k)
+        return candidates[best], scores[best]
+
+    def extend(self, matrix):
+        """Index over `matrix` with its trailing new rows added to their nearest cells.
+
+        Centroids and components stay as fitted; a rebuild re-clusters.
+        """
+        matrix = sparse.csr_matrix(matrix)
+        n_old = self.reduced.shape[0]
+        reduced_new = self._reduce(matrix[n_old:])
+        n_lists = len(self.centroids)
+
+        assignments = np.empty(matrix.shape[0], dtype=np.int64)
+        assignments[self.list_members] = np.repeat(np.arange(n_lists), np.diff(self.list_offsets))
+        assignments[n_old:] = np.argmax(reduced_new @ self.centroids.T, axis=1)
+
+        list_members = np.argsort(assignments, kind='stable').astype(np.int32)
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=n_lists), out=list_offsets[1:])
+        return IVFIndex(matrix, self.components, self.centroids, list_offsets, list_members,
+                        n_probe=self.n_probe, rerank=self.rerank,
+                        reduced=np.vstack([self.reduced, reduced_new]))
+
+    def to_arrays(self):
+        return {
+            'components': self.components,
+            'centroids': self.centroids,
+            'list_offsets': self.list_offsets,
+            'list_members': self.list_members,
+            'reduced': self.reduced,
+        }
+
+    @classmethod
+    def from_arrays(cls, matrix, arrays, **params):
+        return cls(matrix, arrays['components'], arrays['centroids'],
+                   arrays['list_offsets'], arrays['list_members'],
+                   reduced=arrays.get('reduced'), **params)
+
+
+INDEX_BACKENDS = {
+    ExactIndex.backend: ExactIndex,
+    IVFIndex.backend: IVFIndex,
+}
+
+
+def build_index(matrix, backend='auto', **params):
+    """Build a content search index; 'auto' picks exact for small catalogs.
+
+    `params` tune the IVF backend and are ignored by exact search.
+    """
+    if backend == 'auto':
+        backend = IVFIndex.backend if matrix.shape[0] >= ANN_MIN_ROWS else ExactIndex.backend
+    if backend == IVFIndex.backend:
+        return IVFIndex.build(matrix, **params)
+    if backend == ExactIndex.backend:
+        return ExactIndex(matrix)
+    raise ValueError(f"Unknown content index backend: {backend}")
+
+
+def recall_at_k(index, matrix, rows, k=10):
+    """Mean fraction of the exact top-k neighbors that `index` also returns"""
+    exact = ExactIndex(matrix)
+    hits = 0
+    total = 0
+    for row in rows:
+        query = matrix[row]
+        expected = set(exact.search(query, k + 1)[0].tolist()) - {row}
+        found = set(index.search(query, k + 1)[0].tolist()) - {row}
+        hits += len(expected & found)
+        total += len(expected)
+    return hits / total if total else 1.0
+
+
+def build_neighbor_table(matrix, k=DEFAULT_NEIGHBORS, block_size=None, index=None):
+    """Top-k cosine neighbors of every row of an L2-normalized sparse matrix.
+
+    With no index (or an exact one) similarities are computed one block of
+    rows at a time, so peak memory is block_size x n_rows instead of
+    n_rows x n_rows. An approximate index is queried row by row instead.
+    Returns (indices, scores) as (n_rows, k) int32/float32 arrays sorted by
+    descending score, with each row's own index excluded.
+    """
+    matrix = sparse.csr_matrix(matrix)
+    n_rows = matrix.shape[0]
+    k = max(0, min(k, n_rows - 1))
+    neighbor_idx = np.zeros((n_rows, k), dtype=np.int32)
+    neighbor_scores = np.zeros((n_rows, k), dtype=np.float32)
+    if k == 0:
+        return neighbor_idx, neighbor_scores
+
+    if index is not None and not isinstance(index, ExactIndex):
+        for row in range(n_rows):
+            idx, scores = index.search(matrix[row], k + 1)
+            keep = idx != row
+            idx, scores = idx[keep][:k], scores[keep][:k]
+            neighbor_idx[row, :len(idx)] = idx
+            neighbor_scores[row, :len(idx)] = scores
+        return neighbor_idx, neighbor_scores
+
+    if block_size is None:
+        block_size = max(1, MAX_BLOCK_BYTES // (8 * n_rows))
+
+    matrix_t = matrix.T.tocsc()
+    for start in range(0, n_rows, block_size):
+        stop = min(start + block_size, n_rows)
+        sims = (matrix[start:stop] @ matrix_t).toarray()
+        local = np.arange(stop - start)
+        sims[local, local + start] = -np.inf  # never recommend a book for itself
+
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        neighbor_idx[start:stop] = np.take_along_axis(top, order, axis=1)
+        neighbor_scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+
+    return neighbor_idx, neighbor_scores
+
+
+def extend_neighbor_table(neighbor_idx, neighbor_scores, matrix, start, block_size=None):
+    """Neighbor table for `matrix` whose rows from `start` on are new.
+
+    New rows get their own top-k over every row; existing rows only take in
+    new books that beat their current k-th neighbor. Work is proportional to
+    n_rows x n_new rather than a full rebuild. Returns new (indices, scores)
+    arrays; the inputs are left untouched (they may be read-only maps).
+    """
+    matrix = sparse.csr_matrix(matrix)
+    n_rows = matrix.shape[0]
+    k = neighbor_idx.shape[1]
+    if n_rows == start:
+        return neighbor_idx, neighbor_scores
+    if k == 0:
+        # Catalog was too small for any neighbors; build from scratch
+        return build_neighbor_table(matrix, k=DEFAULT_NEIGHBORS)
+
+    neighbor_idx = np.vstack([neighbor_idx, np.zeros((n_rows - start, k), dtype=np.int32)])
+    neighbor_scores = np.vstack([neighbor_scores, np.zeros((n_rows - start, k), dtype=np.float32)])
+    if block_size is None:
+        block_size = max(1, MAX_BLOCK_BYTES // (8 * n_rows))
+
+    for block_start in range(start, n_rows, block_size):
+        block_stop = min(block_start + block_size, n_rows)
+        block = np.arange(block_start, block_stop)
+        # n_rows x block similarities; a book is never its own neighbor
+        sims = (matrix @ matrix[block_start:block_stop].T).toarray()
+        sims[block, np.arange(len(block))] = -np.inf
+
+        top = np.argpartition(-sims.T, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(sims.T, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        neighbor_idx[block_start:block_stop] = np.take_along_axis(top, order, axis=1)
+        neighbor_scores[block_start:block_stop] = np.take_along_axis(top_scores, order, axis=1)
+
+        # Existing rows whose k-th neighbor is beaten by one of the new books
+        # (new rows already ranked every row above)
+        affected = np.flatnonzero((sims[:start] > neighbor_scores[:start, -1:]).any(axis=1))
+        if not len(affected):
+            continue
+        candidates = np.hstack([neighbor_idx[affected], np.broadcast_to(block, (len(affected), len(block)))])
+        scores = np.hstack([neighbor_scores[affected], sims[affected]])
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+        neighbor_idx[affected] = np.take_along_axis(candidates, order, axis=1)
+        neighbor_scores[affected] = np.take_along_axis(scores, order, axis=1)
+
+    return neighbor_idx, neighbor_scores
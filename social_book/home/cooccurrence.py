@@ -0,0 +1,135 @@
+"""Co-shelved books behind the "Readers also shelved" list on the book page.
+
+Every BookCooccurrence row holds a book's top TOP_K co-shelved books with
+the number of readers who listed both. Adding a book to a reading list
+bumps its pairs with the user's most recently shelved other books and
+records them on the ReadingStatus (`shelved_with`); removing it takes back
+exactly the recorded pairs, so counts never drift however long the list.
+Each change touches one small batch of rows in a single transaction, so
+there is no global rebuild and the book page reads one row.
+`manage.py build_book_cooccurrence` rebuilds the lists from scratch.
+Kept free of the ML stack so the ReadingStatus signal handlers can import it.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Book, BookCooccurrence, ReadingStatus
+
+# Co-shelved books stored per book
+TOP_K = 50
+# Most recent other books on a reading list paired with a newly shelved one,
+# bounding the rows a single change writes
+MAX_SHELF_PAIRS = 100
+
+
+def merge_neighbors(neighbors, deltas):
+    """Apply {book pk: count delta} to a stored neighbor list; returns the new top TOP_K"""
+    counts = {pk: count for pk, count in neighbors}
+    for pk, delta in deltas.items():
+        counts[pk] = counts.get(pk, 0) + delta
+    ranked = sorted(((pk, count) for pk, count in counts.items() if count > 0), key=lambda item: (-item[1], item[0]))
+    return [[pk, count] for pk, count in ranked[:TOP_K]]
+
+
+def apply_pairs(book_id, others, delta):
+    """Add `delta` to the count of every (book_id, other) pair, in both books' lists"""
+    deltas = {book_id: {other: delta for other in others}}
+    for other in others:
+        deltas[other] = {book_id: delta}
+
+    with transaction.atomic():
+        rows = BookCooccurrence.objects.select_for_update().in_bulk(list(deltas))
+        created = []
+        for pk, book_deltas in deltas.items():
+            row = rows.get(pk)
+            if row is None:
+                if delta < 0:
+                    # Nothing to take back, e.g. the book itself is being deleted
+                    continue
+                row = BookCooccurrence(book_id=pk)
+                created.append(row)
+            row.neighbors = merge_neighbors(row.neighbors, book_deltas)
+        BookCooccurrence.objects.bulk_update(list(rows.values()), ['neighbors'])
+        # A concurrent first change to the same book already created its row;
+        # losing this one increment is acceptable
+        BookCooccurrence.objects.bulk_create(created, ignore_conflicts=True)
+
+
+def count_shelved_book(status):
+    """Pair a newly created ReadingStatus with the user's most recently shelved other books"""
+    others = list(
+        ReadingStatus.objects.filter(user_id=status.user_id, created_at__lte=status.created_at)
+        .exclude(pk=status.pk)
+        .order_by('-created_at', '-pk')
+        .values_list('book_id', flat=True)[:MAX_SHELF_PAIRS]
+    )
+    if not others:
+        return
+    apply_pairs(status.book_id, others, 1)
+    # update() leaves updated_at alone and sends no signals
+    ReadingStatus.objects.filter(pk=status.pk).update(shelved_with=others)
+    status.shelved_with = others
+
+
+def uncount_shelved_book(status):
+    """Take back the pairs counted for a deleted ReadingStatus.
+
+    Those are the books recorded on it, plus the later entries that
+    recorded its book; their records drop it so it is never taken back
+    twice. When a whole reading list is deleted at once (the user is
+    deleted) later entries are already gone and each one takes back its own.
+    """
+    others = list(status.shelved_with)
+    later = list(
+        ReadingStatus.objects.filter(user_id=status.user_id, created_at__gte=status.created_at)
+        .exclude(pk=status.pk)
+        .only('pk', 'book_id', 'shelved_with')
+    )
+    changed = []
+    for entry in later:
+        if status.book_id in entry.shelved_with:
+            others.append(entry.book_id)
+            entry.shelved_with = [pk for pk in entry.shelved_with if pk != status.book_id]
+            changed.append(entry)
+    if changed:
+        ReadingStatus.objects.bulk_update(changed, ['shelved_with'])
+    if others:
+        apply_pairs(status.book_id, others, -1)
+
+
+def build_neighbor_lists():
+    """Recount every reading list from scratch.
+
+    Each entry is paired with the MAX_SHELF_PAIRS entries created just
+    before it, as count_shelved_book does. Returns ({book pk: neighbor
+    list}, entries whose `shelved_with` changed, unsaved).
+    """
+    shelves = defaultdict(list)
+    statuses = ReadingStatus.objects.order_by('user_id', 'created_at', 'pk').only('pk', 'user_id', 'book_id', 'shelved_with')
+    for status in statuses.iterator():
+        shelves[status.user_id].append(status)
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    changed = []
+    for entries in shelves.values():
+        for i, status in enumerate(entries):
+            others = [entry.book_id for entry in reversed(entries[max(0, i - MAX_SHELF_PAIRS):i])]
+            for other in others:
+                deltas[status.book_id][other] += 1
+                deltas[other][status.book_id] += 1
+            if status.shelved_with != others:
+                status.shelved_with = others
+                changed.append(status)
+    lists = {pk: merge_neighbors([], book_deltas) for pk, book_deltas in deltas.items()}
+    return lists, changed
+
+
+def readers_also_shelved(book_id, limit=6):
+    """Books most often shelved together with `book_id`, most shared first"""
+    neighbors = BookCooccurrence.objects.filter(book_id=book_id).values_list('neighbors', flat=True).first()
+    if not neighbors:
+        return []
+    pks = [pk for pk, _ in neighbors[:limit]]
+    books = Book.objects.select_related('author_id').in_bulk(pks)
+    return [books[pk] for pk in pks if pk in books]
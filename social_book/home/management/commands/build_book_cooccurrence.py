@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from home.cooccurrence import build_neighbor_lists
+from home.models import BookCooccurrence, ReadingStatus
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the "Readers also shelved" lists from every reading list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        lists, changed = build_neighbor_lists()
+        rows = [BookCooccurrence(book_id=pk, neighbors=neighbors) for pk, neighbors in lists.items()]
+
+        with transaction.atomic():
+            # Recorded pairs must match the counts, or removals would take back the wrong ones
+            ReadingStatus.objects.bulk_update(changed, ['shelved_with'], batch_size=options['batch_size'])
+            BookCooccurrence.objects.all().delete()
+            BookCooccurrence.objects.bulk_create(rows, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"Built co-shelved lists for {len(rows)} books"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from home.models import Book, BookMapping
+from home.recommendation_artifacts import load_or_fit_artifacts
+
+
+class Command(BaseCommand):
+    help = 'Map every dataset Book_ID to the site Book with the same title'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        artifacts = load_or_fit_artifacts()
+
+        # First (lowest pk) Book per case-insensitive name, like .filter(...).first()
+        books = {}
+        for pk, name in Book.objects.order_by('pk').values_list('pk', 'book_name'):
+            books.setdefault(BookMapping.make_title_key(name), pk)
+
+        rows = []
+        for book_id, row in artifacts.book_row.items():
+            key = BookMapping.make_title_key(artifacts.df['Title'].iat[row])
+            rows.append(BookMapping(dataset_book_id=int(book_id), title_key=key, book_id=books.get(key)))
+
+        with transaction.atomic():
+            BookMapping.objects.all().delete()
+            BookMapping.objects.bulk_create(rows, batch_size=options['batch_size'])
+
+        matched = sum(1 for row in rows if row.book_id is not None)
+        self.stdout.write(self.style.SUCCESS(
+            f"Mapped {len(rows)} dataset books, {matched} of them to site books"
+        ))
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+import time
+
+import numpy as np
+
+from home.content_index import recall_at_k
+from home.recommendation_artifacts import (
+    DATASET_PATH,
+    RecommendationArtifacts,
+    artifacts_dir,
+    load_dataset,
+    prune_bundles,
+    read_ratings,
+)
+
+
+class Command(BaseCommand):
+    help = 'Fit the recommendation model and write a versioned artifact bundle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', default=DATASET_PATH, help='Path to Final_Dataset.csv')
+        parser.add_argument('--output', default=None, help='Artifact root directory (defaults to RECOMMENDATION_ARTIFACTS_DIR)')
+        parser.add_argument('--keep', type=int, default=3, help='Number of bundle versions to keep on disk')
+        parser.add_argument('--index', choices=['auto', 'exact', 'ivf'], default='auto',
+                            help='Content search backend (auto uses IVF for large catalogs)')
+        parser.add_argument('--n-lists', type=int, default=None, help='IVF cells (defaults to sqrt(n_books))')
+        parser.add_argument('--n-probe', type=int, default=8, help='IVF cells scanned per query')
+        parser.add_argument('--check-recall', type=int, default=0, metavar='N',
+                            help='Compare the index against exact search on N sampled books')
+
+    def handle(self, *args, **options):
+        root = options['output'] or artifacts_dir()
+
+        started = time.perf_counter()
+        df = load_dataset(options['dataset'])
+        self.stdout.write(f"Loaded {len(df)} books from {options['dataset']}")
+
+        index_params = {'n_lists': options['n_lists'], 'n_probe': options['n_probe']}
+        artifacts = RecommendationArtifacts.fit(
+            df, index_backend=options['index'], index_params=index_params, ratings=read_ratings(options['dataset']),
+        )
+        self.stdout.write(
+            f"Fitted model with {artifacts.content_index.backend} content index "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+        if options['check_recall']:
+            self.check_recall(artifacts, options['check_recall'])
+
+        bundle_dir = artifacts.save(root)
+        self.stdout.write(f"Wrote bundle {artifacts.version} to {bundle_dir}")
+
+        for version in prune_bundles(root, keep=options['keep']):
+            self.stdout.write(f"Removed old bundle {version}")
+
+        self.stdout.write(self.style.SUCCESS('Recommendation artifacts built'))
+
+    def check_recall(self, artifacts, sample_size, k=10):
+        matrix = artifacts.tfidf_matrix
+        rng = np.random.default_rng(42)
+        rows = rng.choice(matrix.shape[0], size=min(sample_size, matrix.shape[0]), replace=False)
+
+        started = time.perf_counter()
+        for row in rows:
+            artifacts.content_index.search(matrix[row], k)
+        per_query_ms = (time.perf_counter() - started) * 1000 / len(rows)
+
+        recall = recall_at_k(artifacts.content_index, matrix, rows, k=k)
+        self.stdout.write(f"Recall@{k}: {recall:.3f}, {per_query_ms:.2f} ms/query over {len(rows)} books")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+import time
+
+from home.recommendation_artifacts import DATASET_PATH, convert_dataset, dataset_cache_dir
+
+
+class Command(BaseCommand):
+    help = 'Convert Final_Dataset.csv once into typed columnar files that load without parsing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', default=DATASET_PATH, help='Path to Final_Dataset.csv')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        df = convert_dataset(options['dataset'])
+        self.stdout.write(
+            f"Converted {len(df)} rows ({df.memory_usage(deep=True).sum() / 2**20:.1f} MiB in memory) "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {dataset_cache_dir(options['dataset'])}"))
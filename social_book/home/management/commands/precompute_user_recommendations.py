@@ -0,0 +1,93 @@
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+import time
+
+import numpy as np
+
+from home.models import UserRecommendation
+from home.recommendation_artifacts import RecommendationArtifacts
+
+# Model arrays shared with pool workers through the initializer
+_worker_state = {}
+
+
+def _init_worker(user_factors, item_factors, user_item_matrix):
+    _worker_state['user_factors'] = user_factors
+    _worker_state['item_factors'] = item_factors
+    _worker_state['user_item_matrix'] = user_item_matrix
+
+
+def score_block(start, stop, top_n):
+    """Top-N unrated columns and scores for users[start:stop] in one matrix multiply"""
+    scores = _worker_state['user_factors'][start:stop] @ _worker_state['item_factors'].T
+    rated_users, rated_columns = _worker_state['user_item_matrix'][start:stop].nonzero()
+    scores[rated_users, rated_columns] = -np.inf
+
+    top_n = min(top_n, scores.shape[1])
+    top = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    return start, np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+class Command(BaseCommand):
+    help = 'Score every dataset user offline and store their top-N in UserRecommendation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-n', type=int, default=20, help='Recommendations stored per user')
+        parser.add_argument('--block-size', type=int, default=1024, help='Users scored per matrix multiply')
+        parser.add_argument('--workers', type=int, default=1, help='Processes used for scoring')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        artifacts = RecommendationArtifacts.load()
+        if artifacts is None:
+            raise CommandError("No recommendation bundle found. Run build_recommendation_artifacts first.")
+
+        started = time.perf_counter()
+        n_users = len(artifacts.user_ids)
+        blocks = [
+            (start, min(start + options['block_size'], n_users), options['top_n'])
+            for start in range(0, n_users, options['block_size'])
+        ]
+        init_args = (artifacts.user_factors, artifacts.item_factors, artifacts.user_item_matrix)
+
+        if options['workers'] > 1:
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker,
+                                     initargs=init_args) as pool:
+                results = list(pool.map(score_block, *zip(*blocks)))
+        else:
+            _init_worker(*init_args)
+            results = [score_block(*block) for block in blocks]
+        self.stdout.write(f"Scored {n_users} users in {time.perf_counter() - started:.1f}s")
+
+        # Keyed by the factors' version, so live bundles (same factors) keep serving these rows
+        version = artifacts.factor_version
+        book_ids = np.asarray(artifacts.book_ids)
+        rows = []
+        for start, columns, scores in results:
+            for offset in range(columns.shape[0]):
+                user_id = int(artifacts.user_ids[start + offset])
+                rank = 0
+                for column, score in zip(columns[offset], scores[offset]):
+                    if not np.isfinite(score):
+                        break  # user has rated everything left
+                    rows.append(UserRecommendation(
+                        dataset_user_id=user_id,
+                        dataset_book_id=int(book_ids[column]),
+                        rank=rank,
+                        score=float(score),
+                        model_version=version,
+                    ))
+                    rank += 1
+
+        with transaction.atomic():
+            UserRecommendation.objects.filter(model_version=version).delete()
+            UserRecommendation.objects.bulk_create(rows, batch_size=options['batch_size'])
+            # Older factors are unreachable once workers serve this bundle
+            UserRecommendation.objects.exclude(model_version=version).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {len(rows)} recommendations for model {version}"
+        ))
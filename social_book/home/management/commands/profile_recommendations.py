@@ -0,0 +1,179 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Modules that must not be imported just to serve non-recommendation requests
+HEAVY_MODULES = ['pandas', 'numpy', 'scipy', 'sklearn', 'transformers']
+
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+import home.urls  # pulls in views and admin_views like the first request does
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'import_ms': elapsed * 1000,
+    'heavy': [name for name in %r if name in sys.modules],
+}))
+"""
+
+# Loads the model, faults its arrays in, then reports memory once every
+# worker is resident so shared pages are counted as shared
+MEMORY_SCRIPT = """
+import json, sys
+import django
+django.setup()
+from home.management.commands.profile_recommendations import read_memory, touch_model
+from home.recommendation_model import model_holder
+touch_model(model_holder.get())
+print('ready', flush=True)
+sys.stdin.readline()
+print(json.dumps(read_memory()), flush=True)
+"""
+
+
+def read_memory(pid='self'):
+    """kB totals from /proc/<pid>/smaps_rollup (Linux only)"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup', encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'unique': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+    }
+
+
+def touch_model(model):
+    """Read every page of the large model arrays, as serving eventually does"""
+    for values in (model.tfidf_matrix.data, model.tfidf_matrix.indices,
+                   model.user_item_matrix.data, model.user_item_matrix.indices,
+                   model.user_factors, model.item_factors,
+                   model.neighbor_idx, model.neighbor_scores):
+        float(values.sum())
+
+
+class Command(BaseCommand):
+    help = 'Measure the startup and memory cost of the app and of the recommendation model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-import-ms', type=float, default=None,
+                            help='Fail if importing the app takes longer than this')
+        parser.add_argument('--memory', type=int, default=0, metavar='WORKERS',
+                            help='Load the model in this many processes and report unique vs shared memory')
+        parser.add_argument('--recommend', type=int, default=0, metavar='CALLS',
+                            help='Time this many uncached hybrid recommend() calls')
+
+    def handle(self, *args, **options):
+        if options['memory']:
+            self.report_memory(options['memory'])
+            return
+        if options['recommend']:
+            self.benchmark_recommend(options['recommend'])
+            return
+        self.check_startup(options['max_import_ms'])
+
+    def _env(self):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'social_book.settings')
+        return env
+
+    def benchmark_recommend(self, calls, n=5):
+        import numpy as np
+        from home.recommendation_engines import engines
+        from home.recommendation_model import get_bot, model_holder
+
+        bot = get_bot()
+        model = model_holder.get()
+        rng = np.random.default_rng(42)
+        book_ids = rng.choice(model.df['Book_ID'].to_numpy(), size=calls)
+        user_ids = rng.choice(np.asarray(model.user_ids), size=calls)
+
+        # Bypass the result cache so every call does the full merge
+        timings = np.empty(calls)
+        for i in range(calls):
+            started = time.perf_counter()
+            bot._recommend(model, int(user_ids[i]), int(book_ids[i]), n)
+            timings[i] = (time.perf_counter() - started) * 1000
+        self.stdout.write(
+            f"recommend(user_id, book_id, n={n}) over {calls} calls: mean {timings.mean():.2f} ms, "
+            f"p50 {np.percentile(timings, 50):.2f} ms, p95 {np.percentile(timings, 95):.2f} ms"
+        )
+        for name, stats in engines.stats().items():
+            histogram = ', '.join(f"{bucket} {count}" for bucket, count in stats['latency'].items() if count)
+            self.stdout.write(
+                f"  {name}: {stats['calls']} calls, {stats['timeouts']} timeouts, {stats['errors']} errors"
+                + (f" ({histogram})" if histogram else '')
+            )
+
+    def report_memory(self, n_workers):
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError('Memory report needs /proc/<pid>/smaps_rollup (Linux)')
+
+        workers = [
+            subprocess.Popen([sys.executable, '-c', MEMORY_SCRIPT], stdin=subprocess.PIPE,
+                             stdout=subprocess.PIPE, text=True, env=self._env(),
+                             cwd=str(settings.BASE_DIR))
+            for _ in range(n_workers)
+        ]
+        try:
+            for worker in workers:
+                if worker.stdout.readline().strip() != 'ready':
+                    raise CommandError('A worker failed to load the model')
+            for worker in workers:
+                worker.stdin.write('\n')
+                worker.stdin.flush()
+            reports = [json.loads(worker.stdout.readline()) for worker in workers]
+        finally:
+            for worker in workers:
+                worker.kill()
+                worker.wait()
+
+        mmap = 'on' if getattr(settings, 'RECOMMENDATION_MMAP', True) else 'off'
+        self.stdout.write(f"{n_workers} workers with the model loaded (RECOMMENDATION_MMAP {mmap}):")
+        for i, report in enumerate(reports):
+            self.stdout.write(
+                f"  worker {i}: rss {report['rss'] / 1024:.1f} MiB, unique {report['unique'] / 1024:.1f} MiB, "
+                f"shared {report['shared'] / 1024:.1f} MiB, pss {report['pss'] / 1024:.1f} MiB"
+            )
+        total_pss = sum(report['pss'] for report in reports)
+        self.stdout.write(f"Total proportional memory: {total_pss / 1024:.1f} MiB")
+
+    def check_startup(self, max_import_ms):
+        # Measure in a fresh interpreter; this process has already imported everything
+        completed = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT % (HEAVY_MODULES,)],
+            capture_output=True, text=True, env=self._env(),
+            cwd=str(settings.BASE_DIR),
+        )
+        if completed.returncode != 0:
+            raise CommandError(completed.stderr)
+        report = json.loads(completed.stdout.strip().splitlines()[-1])
+
+        self.stdout.write(f"App import: {report['import_ms']:.0f} ms")
+        if report['heavy']:
+            self.stdout.write(self.style.ERROR(
+                f"Heavy modules imported at startup: {', '.join(report['heavy'])}"
+            ))
+        else:
+            self.stdout.write('No ML modules imported at startup')
+
+        from home.recommendation_model import warmup
+        started = time.perf_counter()
+        version = warmup()
+        self.stdout.write(f"Recommendation warmup: {(time.perf_counter() - started) * 1000:.0f} ms (model {version})")
+
+        if report['heavy']:
+            raise CommandError('Startup check failed: ML stack is loaded eagerly')
+        if max_import_ms is not None and report['import_ms'] > max_import_ms:
+            raise CommandError(f"Startup check failed: app import exceeded {max_import_ms:.0f} ms")
+        self.stdout.write(self.style.SUCCESS('Startup check passed'))
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from home.qa_service import QAWorker, qa_address, qa_authkey, serve
+
+
+class Command(BaseCommand):
+    help = 'Run the dedicated question-answering worker that web workers forward to'
+
+    def handle(self, *args, **options):
+        address = qa_address()
+        if not address:
+            raise CommandError("Set RECOMMENDATION_QA_ADDRESS to run a dedicated QA worker.")
+
+        try:
+            authkey = qa_authkey()
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        worker = QAWorker(max_queue=getattr(settings, 'RECOMMENDATION_QA_QUEUE_SIZE', 32))
+        self.stdout.write(self.style.SUCCESS(f"QA worker listening on {address}"))
+        serve(address, authkey, worker)
@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+import time
+
+import pandas as pd
+
+from home.models import Book
+from home.recommendation_artifacts import (
+    RecommendationArtifacts,
+    live_books_frame,
+    load_dataset,
+    prune_bundles,
+    read_current_version,
+    read_ratings,
+    reload_interval,
+    set_current_version,
+)
+
+
+def live_book_records():
+    """(pk, name, author, genre) for every site book, oldest first"""
+    return list(Book.objects.order_by('pk').values_list('pk', 'book_name', 'author_id__name', 'genre'))
+
+
+class Command(BaseCommand):
+    help = ('Append site books to the recommendation bundle as a live bundle workers hot-swap, '
+            'and report vocabulary drift')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--refit-on-drift', action='store_true',
+                            help='Rebuild the bundle with site books included when drift exceeds '
+                                 'RECOMMENDATION_DRIFT_THRESHOLD')
+        parser.add_argument('--keep', type=int, default=3, help='Number of bundle versions to keep on disk')
+        parser.add_argument('--watch', action='store_true',
+                            help='Keep running and sync again every RECOMMENDATION_RELOAD_INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        artifacts = self.load_current()
+        if not options['watch']:
+            self.sync(artifacts, options)
+            return
+
+        while True:
+            try:
+                # A new base bundle (build_recommendation_artifacts) replaces ours
+                if read_current_version() != artifacts.version:
+                    artifacts = self.load_current()
+                artifacts = self.sync(artifacts, options, quiet=True)
+            except Exception as e:
+                self.stderr.write(f"Live books sync failed: {e}")
+            finally:
+                close_old_connections()
+            time.sleep(reload_interval())
+
+    def load_current(self):
+        artifacts = RecommendationArtifacts.load(with_base=True)
+        if artifacts is None:
+            raise CommandError("No recommendation bundle; run 'manage.py build_recommendation_artifacts' first")
+        return artifacts
+
+    def sync(self, artifacts, options, quiet=False):
+        """Save the bundle with the current site books if they changed; returns the snapshot now served"""
+        started = time.perf_counter()
+        records = live_book_records()
+        live = artifacts.with_live_books(records)
+        if live is artifacts:
+            if not quiet:
+                self.stdout.write(f"Site books unchanged; bundle {artifacts.version} is current")
+            return artifacts
+        if live is artifacts.base:
+            # No site books left to append: serve the base bundle again
+            set_current_version(live.version)
+            self.stdout.write(f"No site books to append; serving base bundle {live.version}")
+            return live
+
+        bundle_dir = live.save()
+        threshold = getattr(settings, 'RECOMMENDATION_DRIFT_THRESHOLD', 0.25)
+        self.stdout.write(
+            f"Appended {len(live.live_records)} of {len(records)} site books to model {live.base_version} "
+            f"in {time.perf_counter() - started:.2f}s ({bundle_dir}); vocabulary drift "
+            f"{live.vocabulary_drift:.1%} (threshold {threshold:.0%})"
+        )
+        for version in prune_bundles(keep=options['keep']):
+            self.stdout.write(f"Removed old bundle {version}")
+        if live.vocabulary_drift <= threshold:
+            self.stdout.write(self.style.SUCCESS('Running workers pick these books up on their next poll'))
+            return live
+        if not options['refit_on_drift']:
+            self.stdout.write(self.style.WARNING('Drift exceeds the threshold; rerun with --refit-on-drift'))
+            return live
+
+        # Fit on the dataset plus the site books so their words enter the vocabulary
+        started = time.perf_counter()
+        df = pd.concat([load_dataset(), live_books_frame(live.live_records)], ignore_index=True)
+        df[['Author', 'Genres']] = df[['Author', 'Genres']].astype('category')
+        refitted = RecommendationArtifacts.fit(df, ratings=read_ratings())
+        bundle_dir = refitted.save()
+        for version in prune_bundles(keep=options['keep']):
+            self.stdout.write(f"Removed old bundle {version}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Refitted bundle {refitted.version} with {len(live.live_records)} site books "
+            f"in {time.perf_counter() - started:.1f}s ({bundle_dir})"
+        ))
+        return refitted
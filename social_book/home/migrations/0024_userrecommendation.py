@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0023_remove_book_search_count_recentsearch_search_count_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dataset_user_id', models.BigIntegerField()),
+                ('dataset_book_id', models.BigIntegerField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('model_version', models.CharField(max_length=64)),
+            ],
+            options={
+                'ordering': ['dataset_user_id', 'rank'],
+                'indexes': [models.Index(fields=['dataset_user_id', 'model_version', 'rank'], name='home_userre_dataset_7496d8_idx'), models.Index(fields=['model_version'], name='home_userre_model_v_e45931_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 08:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0024_userrecommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookMapping',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dataset_book_id', models.BigIntegerField(unique=True)),
+                ('title_key', models.CharField(db_index=True, max_length=255)),
+                ('book', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='dataset_mappings', to='home.book')),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 09:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0025_bookmapping'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookCooccurrence',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cooccurrence', serialize=False, to='home.book')),
+                ('neighbors', models.JSONField(default=list)),
+            ],
+        ),
+    ]
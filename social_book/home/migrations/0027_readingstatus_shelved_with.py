@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 09:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0026_bookcooccurrence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='readingstatus',
+            name='shelved_with',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
 from django.db.models import Avg, Count
+from django.db.models.functions import Lower
 from django.urls import reverse
 
 from django.contrib.auth.models import User
@@ -135,6 +136,8 @@ class ReadingStatus(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Books already on the list this one was counted with in BookCooccurrence, see cooccurrence.py
+    shelved_with = models.JSONField(default=list, blank=True)
 
     class Meta:
         unique_together = ('user', 'book')  # Prevent duplicate entries
@@ -143,3 +146,73 @@ class ReadingStatus(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.book.book_name} ({self.get_status_display()})"
 
+
+# UserRecommendation Model
+class UserRecommendation(models.Model):
+    """Precomputed collaborative top-N for a dataset user, see precompute_user_recommendations"""
+    dataset_user_id = models.BigIntegerField()  # User_ID from Final_Dataset.csv
+    dataset_book_id = models.BigIntegerField()  # Book_ID from Final_Dataset.csv
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    model_version = models.CharField(max_length=64)  # factor_version of the bundle that scored it
+
+    class Meta:
+        ordering = ['dataset_user_id', 'rank']
+        indexes = [
+            models.Index(fields=['dataset_user_id', 'model_version', 'rank']),
+            models.Index(fields=['model_version']),
+        ]
+
+    def __str__(self):
+        return f"User {self.dataset_user_id} #{self.rank}: book {self.dataset_book_id}"
+
+
+# BookMapping Model
+class BookMapping(models.Model):
+    """Dataset Book_ID -> site Book with the same title (case-insensitive), see build_book_mapping"""
+    dataset_book_id = models.BigIntegerField(unique=True)  # Book_ID from Final_Dataset.csv
+    title_key = models.CharField(max_length=255, db_index=True)  # lowercased dataset title
+    book = models.ForeignKey(Book, null=True, blank=True, on_delete=models.SET_NULL, related_name='dataset_mappings')
+
+    @staticmethod
+    def make_title_key(title):
+        return str(title).lower()[:255]
+
+    @classmethod
+    def refresh_titles(cls, title_keys):
+        """Re-point mappings for these titles at the first matching Book (or none)"""
+        for key in set(title_keys):
+            book_id = (
+                Book.objects.filter(book_name__iexact=key)
+                .order_by('pk')
+                .values_list('pk', flat=True)
+                .first()
+            )
+            cls.objects.filter(title_key=key).update(book_id=book_id)
+
+    @classmethod
+    def map_titles(cls, titles):
+        """Create mappings for {dataset Book_ID: title} in two queries; returns {dataset Book_ID: Book or None}"""
+        keys = {book_id: cls.make_title_key(title) for book_id, title in titles.items()}
+        books = {}
+        matches = Book.objects.annotate(name_key=Lower('book_name')).filter(name_key__in=set(keys.values()))
+        for book in matches.order_by('pk'):
+            books.setdefault(book.name_key, book)
+        cls.objects.bulk_create(
+            [cls(dataset_book_id=book_id, title_key=key, book=books.get(key)) for book_id, key in keys.items()],
+            ignore_conflicts=True,
+        )
+        return {book_id: books.get(key) for book_id, key in keys.items()}
+
+    def __str__(self):
+        return f"Dataset book {self.dataset_book_id} -> {self.book_id}"
+
+
+# BookCooccurrence Model
+class BookCooccurrence(models.Model):
+    """Books most often on the same reading lists as `book`, see cooccurrence.py"""
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='cooccurrence')
+    neighbors = models.JSONField(default=list)  # [[book pk, shared readers], ...], most shared first
+
+    def __str__(self):
+        return f"Shelved with {self.book_id}: {len(self.neighbors)} books"
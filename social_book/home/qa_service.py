@@ -0,0 +1,176 @@
+"""Question-answering model served by one dedicated worker.
+
+The transformers QA pipeline holds hundreds of MB of weights, so it is
+opt-in (RECOMMENDATION_QA_ENABLED) and loaded lazily by a single worker
+thread. Callers submit questions through a bounded queue and wait with a
+timeout, so a slow or missing model never blocks a request for long.
+
+When RECOMMENDATION_QA_ADDRESS is set, web workers forward questions to a
+separate `manage.py run_qa_worker` process instead, so only that process
+keeps the model resident. The connection pickles messages, so both sides
+must share an explicit RECOMMENDATION_QA_AUTHKEY.
+"""
+from multiprocessing.connection import Client, Listener
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+QA_MODEL = "distilbert-base-cased-distilled-squad"
+
+
+class QAUnavailable(Exception):
+    """The QA model is disabled, failed to load, overloaded or too slow"""
+
+
+class _Job:
+    def __init__(self, question, context):
+        self.question = question
+        self.context = context
+        self.done = threading.Event()
+        self.cancelled = False
+        self.result = None
+        self.error = None
+
+
+class QAWorker:
+    """Owns the QA pipeline and answers queued questions one at a time"""
+
+    def __init__(self, model=QA_MODEL, max_queue=32):
+        self.model = model
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='qa-worker', daemon=True)
+                    self._thread.start()
+
+    def _load_pipeline(self):
+        from transformers import pipeline as build_pipeline
+        return build_pipeline("question-answering", model=self.model)
+
+    def _run(self):
+        pipeline = None
+        load_error = None
+        try:
+            pipeline = self._load_pipeline()
+        except Exception as e:
+            logger.warning("Could not load QA pipeline: %s", e)
+            load_error = e
+
+        while True:
+            job = self._queue.get()
+            if job.cancelled:
+                continue  # caller already gave up
+            if load_error is not None:
+                job.error = load_error
+            else:
+                try:
+                    job.result = pipeline(question=job.question, context=job.context)
+                except Exception as e:
+                    job.error = e
+            job.done.set()
+
+    def answer(self, question, context, timeout=5.0):
+        """Answer dict ({'answer', 'score', ...}) or QAUnavailable, within `timeout` seconds overall"""
+        self._ensure_started()
+        deadline = time.monotonic() + timeout
+        job = _Job(question, context)
+        try:
+            self._queue.put(job, timeout=timeout)
+        except queue.Full:
+            raise QAUnavailable("QA queue is full")
+        if not job.done.wait(max(0.0, deadline - time.monotonic())):
+            job.cancelled = True
+            raise QAUnavailable("QA model timed out")
+        if job.error is not None:
+            raise QAUnavailable(str(job.error))
+        return job.result
+
+
+class QAClient:
+    """Forwards questions to a run_qa_worker process"""
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+
+    def answer(self, question, context, timeout=5.0):
+        try:
+            with Client(self.address, authkey=self.authkey) as conn:
+                conn.send((question, context, timeout))
+                if not conn.poll(timeout):
+                    raise QAUnavailable("QA worker timed out")
+                result = conn.recv()
+        except (OSError, EOFError) as e:
+            raise QAUnavailable(f"QA worker unreachable: {e}")
+        if 'error' in result:
+            raise QAUnavailable(result['error'])
+        return result
+
+
+def serve(address, authkey, worker):
+    """Accept connections from QAClient and answer through `worker` (blocks forever)"""
+    with Listener(address, authkey=authkey) as listener:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                logger.warning("Rejected QA connection: %s", e)
+                continue
+            threading.Thread(target=_handle_connection, args=(conn, worker), daemon=True).start()
+
+
+def _handle_connection(conn, worker):
+    with conn:
+        try:
+            question, context, timeout = conn.recv()
+            conn.send(worker.answer(question, context, timeout))
+        except QAUnavailable as e:
+            conn.send({'error': str(e)})
+        except (OSError, EOFError):
+            pass
+
+
+def qa_address():
+    address = getattr(settings, 'RECOMMENDATION_QA_ADDRESS', None)
+    if isinstance(address, (list, tuple)):
+        return tuple(address)
+    return address
+
+
+def qa_authkey():
+    """Shared secret for the QA worker connection; never defaults to a committed key"""
+    authkey = getattr(settings, 'RECOMMENDATION_QA_AUTHKEY', None)
+    if not authkey:
+        raise ImproperlyConfigured("Set RECOMMENDATION_QA_AUTHKEY when RECOMMENDATION_QA_ADDRESS is set.")
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_qa_service():
+    """Shared QA service for this process, or None when QA is disabled"""
+    global _service
+    if not getattr(settings, 'RECOMMENDATION_QA_ENABLED', False):
+        return None
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                address = qa_address()
+                if address:
+                    _service = QAClient(address, qa_authkey())
+                else:
+                    _service = QAWorker(max_queue=getattr(settings, 'RECOMMENDATION_QA_QUEUE_SIZE', 32))
+    return _service
@@ -0,0 +1,799 @@
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from .catalog_stats import DEFAULT_MIN_RATINGS, CatalogStats, GenreMatrix, PopularityRanking
+from .columnar import read_frame, read_schema, write_frame
+from .content_index import DEFAULT_NEIGHBORS, INDEX_BACKENDS, build_index, build_neighbor_table, extend_neighbor_table
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_PATH = os.path.join(BASE_DIR, 'static', 'assets', 'dataset', 'Final_Dataset.csv')
+DEFAULT_ARTIFACTS_DIR = os.path.join(BASE_DIR, 'artifacts', 'recommendation')
+
+# Bump whenever the on-disk layout changes so stale bundles are ignored
+ARTIFACT_FORMAT_VERSION = 8
+CURRENT_POINTER = 'CURRENT'
+MANIFEST_NAME = 'manifest.json'
+LIVE_RECORDS_NAME = 'live_records.json'
+# Files a live-books bundle shares unchanged with its base bundle (hard-linked)
+BASE_FILES = [
+    'tfidf_vocabulary.json', 'tfidf_idf.npy',
+    'user_item.data.npy', 'user_item.indices.npy', 'user_item.indptr.npy', 'user_item.shape.npy',
+    'user_factors.npy', 'item_factors.npy', 'user_ids.npy', 'book_ids.npy',
+    'item_neighbor_idx.npy', 'item_neighbor_scores.npy',
+    'ratings.data.npy', 'ratings.indices.npy', 'ratings.indptr.npy', 'ratings.shape.npy', 'rating_user_ids.npy',
+]
+
+TFIDF_PARAMS = {
+    'stop_words': 'english',
+    'ngram_range': (1, 3),  # Wider ngram range to capture more context
+    'min_df': 3,  # Higher min_df to filter out rare terms
+    'max_features': 10000,  # Limit features to most important ones
+}
+SVD_COMPONENTS = 20
+# Rating-similarity neighbors kept per book for the item-item engine
+ITEM_NEIGHBORS = 50
+
+# Columns of Final_Dataset.csv the model uses, with compact dtypes; Title,
+# Author and Genres repeat on every rating row so they load as categoricals
+DATASET_DTYPES = {
+    'User_ID': np.int32,
+    'Book_ID': np.int32,
+    'Rating': np.int8,
+    'Title': 'category',
+    'Author': 'category',
+    'Genres': 'category',
+}
+# Per-book columns kept in a bundle for serving
+CATALOG_COLUMNS = [
+    'Book_ID', 'Title', 'Author', 'Genres', 'Rating_Mean', 'Rating_Count',
+    'Clean_Title', 'Clean_Author', 'Clean_Genres',
+]
+BOOK_COLUMNS = ['Book_ID', 'Title', 'Author', 'Genres']
+# Seconds between checks of the CURRENT pointer for a newer bundle
+DEFAULT_RELOAD_INTERVAL = 30
+
+
+def artifacts_dir():
+    """Root directory holding versioned recommendation bundles"""
+    try:
+        from django.conf import settings
+        return str(getattr(settings, 'RECOMMENDATION_ARTIFACTS_DIR', DEFAULT_ARTIFACTS_DIR))
+    except Exception:
+        return DEFAULT_ARTIFACTS_DIR
+
+
+def mmap_mode():
+    """np.load mmap_mode for bundle arrays ('r' shares pages between workers)"""
+    try:
+        from django.conf import settings
+        return 'r' if getattr(settings, 'RECOMMENDATION_MMAP', True) else None
+    except Exception:
+        return 'r'
+
+
+def reload_interval():
+    try:
+        from django.conf import settings
+        return getattr(settings, 'RECOMMENDATION_RELOAD_INTERVAL', DEFAULT_RELOAD_INTERVAL)
+    except Exception:
+        return DEFAULT_RELOAD_INTERVAL
+
+
+def read_current_version(root=None):
+    """Bundle version named by the CURRENT pointer, or None if there is none"""
+    pointer = os.path.join(root or artifacts_dir(), CURRENT_POINTER)
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer, encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def set_current_version(version, root=None):
+    """Atomically point CURRENT at an existing bundle version"""
+    root = root or artifacts_dir()
+    pointer_tmp = os.path.join(root, f'.{CURRENT_POINTER}.tmp')
+    with open(pointer_tmp, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(root, CURRENT_POINTER))
+
+
+def read_manifest(root, version):
+    """Manifest of one bundle version, or None if it can't be read"""
+    try:
+        with open(os.path.join(root, version, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def link_files(source_dir, target_dir, names):
+    """Hard-link all of `names` from source_dir into target_dir, or none of them"""
+    linked = []
+    try:
+        for name in names:
+            os.link(os.path.join(source_dir, name), os.path.join(target_dir, name))
+            linked.append(name)
+    except OSError:
+        for name in linked:
+            os.remove(os.path.join(target_dir, name))
+        return False
+    return True
+
+
+def clean_text(text):
+    if pd.isna(text):
+        return ""
+    text = str(text).lower()
+    text = re.sub(r'[^\w\s]', '', text)  # Remove punctuation
+    text = re.sub(r'\s+', ' ', text).strip()  # Normalize whitespace
+    return text
+
+
+def dataset_cache_dir(path=DATASET_PATH):
+    """Directory holding the columnar copy of a dataset CSV"""
+    return os.path.splitext(path)[0] + '.columns'
+
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return {'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+
+
+def convert_dataset(path=DATASET_PATH):
+    """Parse the CSV once with compact dtypes and store it column by column"""
+    df = pd.read_csv(path, usecols=list(DATASET_DTYPES), dtype=DATASET_DTYPES)
+    write_frame(df, dataset_cache_dir(path), meta=_source_signature(path))
+    return df
+
+
+def read_ratings(path=DATASET_PATH):
+    """Raw rating rows, from the columnar copy when it is up to date with the CSV"""
+    cache_dir = dataset_cache_dir(path)
+    schema = read_schema(cache_dir)
+    if schema is not None and schema['meta'] == _source_signature(path):
+        return read_frame(cache_dir, columns=list(DATASET_DTYPES))
+    if schema is not None:
+        logger.warning("Columnar dataset %s is stale; run convert_dataset", cache_dir)
+    return pd.read_csv(path, usecols=list(DATASET_DTYPES), dtype=DATASET_DTYPES)
+
+
+def _map_values(values, func):
+    """Apply `func` once per distinct value of a categorical column"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Code -1 (missing) picks the trailing func(nan)
+        mapped = np.array([func(v) for v in values.cat.categories] + [func(np.nan)], dtype=object)
+        return pd.Series(mapped[values.cat.codes.to_numpy()], index=values.index)
+    return values.apply(func)
+
+
+def load_dataset(path=DATASET_PATH):
+    """Read the ratings and derive the cleaned content columns"""
+    df = read_ratings(path)
+
+    # Rating aggregates over all rows of a book, before duplicates are dropped
+    ratings = df.groupby(['Title', 'Author'], observed=True)['Rating'].agg(Rating_Mean='mean', Rating_Count='count')
+
+    # First remove exact duplicates from dataset; keep positional and label
+    # indexes identical so df rows line up with matrix rows
+    df = df.drop_duplicates(subset=['Title', 'Author'], keep='first').reset_index(drop=True)
+    df = df.join(ratings, on=['Title', 'Author'])
+    # Titles are nearly unique per book, so a categorical no longer pays off
+    df['Title'] = df['Title'].astype(object)
+
+    return add_content_columns(df)
+
+
+def add_content_columns(df):
+    """Cleaned title/author/genres and the weighted text TF-IDF is fitted on"""
+    df['Clean_Title'] = df['Title'].apply(clean_text)
+    df['Clean_Author'] = _map_values(df['Author'], clean_text)
+    df['Clean_Genres'] = _map_values(df['Genres'], lambda x: clean_text(str(x).replace('|', ' ')))
+
+    # More balanced weighted combination
+    df['Content'] = (
+        df['Clean_Title'] * 3 + ' ' +  # Highest weight to title
+        df['Clean_Author'] * 2 + ' ' +  # Medium weight to author
+        df['Clean_Genres']  # Lower weight to genres
+    )
+    return df
+
+
+def live_books_frame(records):
+    """Catalog rows for site books given as (pk, name, author, genre).
+
+    Book_ID is -pk so live books never collide with dataset ids. Site
+    reviews use a different scale, so live books carry no dataset ratings.
+    """
+    df = pd.DataFrame(list(records), columns=['pk', 'Title', 'Author', 'Genres'])
+    df.insert(0, 'Book_ID', -df.pop('pk').astype(np.int64))
+    df['Title'] = df['Title'].astype(object)
+    df['Rating_Mean'] = 0.0
+    df['Rating_Count'] = 0
+    return add_content_columns(df)
+
+
+def save_csr(directory, name, matrix):
+    """Write a CSR matrix as raw .npy component files that can be memory-mapped"""
+    matrix = sparse.csr_matrix(matrix)
+    for part in ('data', 'indices', 'indptr'):
+        np.save(os.path.join(directory, f'{name}.{part}.npy'), getattr(matrix, part))
+    np.save(os.path.join(directory, f'{name}.shape.npy'), np.asarray(matrix.shape, dtype=np.int64))
+
+
+def load_csr(directory, name, mmap_mode=None):
+    """Reassemble a matrix written by save_csr without copying its components"""
+    data, indices, indptr = (
+        np.load(os.path.join(directory, f'{name}.{part}.npy'), mmap_mode=mmap_mode)
+        for part in ('data', 'indices', 'indptr')
+    )
+    shape = tuple(int(d) for d in np.load(os.path.join(directory, f'{name}.shape.npy')))
+    return sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+
+
+def restore_vectorizer(vocabulary, idf):
+    """Rebuild a fitted TfidfVectorizer from its vocabulary and IDF weights"""
+    tfidf = TfidfVectorizer(**TFIDF_PARAMS)
+    tfidf.vocabulary_ = vocabulary
+    tfidf.idf_ = idf
+    return tfidf
+
+
+def build_user_item_matrix(df):
+    """Sparse users x books rating matrix built straight from rating triplets.
+
+    Repeated (user, book) ratings are averaged like pivot_table did, but
+    memory scales with the number of ratings rather than users x books.
+    Returns (user_ids, book_ids, csr_matrix) with ids in sorted order.
+    """
+    # Site books merged into a refit have no ratings
+    ratings = df.dropna(subset=['User_ID', 'Rating']).groupby(['User_ID', 'Book_ID'])['Rating'].mean()
+    user_codes, user_ids = pd.factorize(ratings.index.get_level_values('User_ID').astype(np.int64), sort=True)
+    book_codes, book_ids = pd.factorize(ratings.index.get_level_values('Book_ID'), sort=True)
+    matrix = sparse.coo_matrix(
+        (ratings.to_numpy(dtype=np.float64), (user_codes, book_codes)),
+        shape=(len(user_ids), len(book_ids)),
+    ).tocsr()
+    matrix.eliminate_zeros()  # a 0 rating counted as unrated in the dense pivot
+    return user_ids.tolist(), book_ids.tolist(), matrix
+
+
+def build_rating_matrix(df, ratings):
+    """Users x catalog rows matrix of every raw rating row.
+
+    The catalog keeps one row per (Title, Author), so all but the first
+    rating of a book sit on dropped rows; they are mapped back onto the
+    catalog row by title and author. Repeated ratings are averaged.
+    Returns (user_ids, csr_matrix) with user ids in sorted order.
+    """
+    catalog = pd.MultiIndex.from_arrays([df['Title'].astype(object), df['Author'].astype(object)])
+    first = ~catalog.duplicated()
+    rows = catalog[first].get_indexer(
+        pd.MultiIndex.from_arrays([ratings['Title'].astype(object), ratings['Author'].astype(object)])
+    )
+    rated = pd.DataFrame({
+        'User_ID': ratings['User_ID'].to_numpy(),
+        'Row': np.where(rows >= 0, np.flatnonzero(first)[rows], -1),
+        'Rating': ratings['Rating'].to_numpy(),
+    })
+    rated = rated[rated['Row'] >= 0].dropna().groupby(['User_ID', 'Row'])['Rating'].mean()
+    user_codes, user_ids = pd.factorize(rated.index.get_level_values('User_ID').astype(np.int64), sort=True)
+    matrix = sparse.coo_matrix(
+        (rated.to_numpy(dtype=np.float64), (user_codes, rated.index.get_level_values('Row'))),
+        shape=(len(user_ids), len(df)),
+    ).tocsr()
+    matrix.eliminate_zeros()
+    return user_ids.tolist(), matrix
+
+
+def build_item_neighbor_table(rating_matrix, k=ITEM_NEIGHBORS):
+    """Top-k books by cosine similarity of their rating columns, for every catalog row.
+
+    Computed in row blocks like the content neighbor table. Returns
+    (indices, scores) as (n_books, k) int32/float32 arrays of catalog
+    rows; books with fewer than k co-rated books are padded with zero
+    scores.
+    """
+    items = normalize(sparse.csr_matrix(rating_matrix).T.tocsr())
+    return build_neighbor_table(items, k=k)
+
+
+class RecommendationArtifacts:
+    """Everything the recommender needs at serving time, fitted or loaded"""
+
+    def __init__(self, df, tfidf, tfidf_matrix, user_ids, book_ids,
+                 user_item_matrix, user_factors, item_factors,
+                 neighbor_idx, neighbor_scores, content_index,
+                 item_neighbor_idx, item_neighbor_scores, rating_user_ids, rating_matrix,
+                 version=None):
+        self.df = df
+        self.tfidf = tfidf
+        self.tfidf_matrix = tfidf_matrix
+        self.user_ids = user_ids
+        self.book_ids = book_ids
+        self.user_item_matrix = user_item_matrix
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.neighbor_idx = neighbor_idx
+        self.neighbor_scores = neighbor_scores
+        self.content_index = content_index
+        # Every raw rating (users x catalog rows) and, per catalog row, the
+        # top rating-similar rows, for the item-item engine
+        self.rating_user_ids = rating_user_ids
+        self.rating_matrix = rating_matrix
+        self.item_neighbor_idx = item_neighbor_idx
+        self.item_neighbor_scores = item_neighbor_scores
+        self.version = version
+        # Version for result caches: changes when live books change, same in
+        # every worker. Set once per snapshot, since it is read on every request
+        self.cache_version = version
+        # Site books appended by with_live_books(); `base` is the bundle snapshot
+        # they were appended to (`base_version` once saved as a live bundle)
+        self.base = None
+        self.base_version = None
+        self.live_records = []
+        self.live_terms = (0, 0)  # (out-of-vocabulary, total) unigrams of live books
+        self.build_lookups()
+
+    @property
+    def factor_version(self):
+        """Version of the bundle the SVD factors were fitted in; live bundles keep their base's"""
+        if self.base is not None:
+            return self.base.version
+        return self.base_version or self.version
+
+    @property
+    def vocabulary_drift(self):
+        """Share of live-book words the fitted TF-IDF vocabulary doesn't know"""
+        oov, total = self.live_terms
+        return oov / total if total else 0.0
+
+    def with_live_books(self, records):
+        """Snapshot with site books appended, without refitting.
+
+        `records` are (pk, name, author, genre) for every site book; those
+        whose cleaned title the bundle already has are skipped. New rows are
+        vectorized with the fitted vocabulary and IDF, added to the content
+        index and merged into the neighbor lists. When the records only add
+        books to the previous call's, just those are appended; otherwise the
+        live rows are rebuilt on the bundle.
+        """
+        if self.base_version is not None and self.base is None:
+            raise ValueError("Live bundle loaded without its base; use load(with_base=True)")
+        base = self.base or self
+        live = [tuple(r) for r in records if clean_text(r[1]) and clean_text(r[1]) not in base.title_row]
+        if live == self.live_records:
+            return self
+        start = self
+        if live[:len(self.live_records)] != self.live_records:
+            start = base
+        added = live[len(start.live_records):]
+        if not added:
+            return start
+
+        frame = live_books_frame(added)
+        vectors = self.tfidf.transform(frame['Content'])
+        tfidf_matrix = sparse.vstack([start.tfidf_matrix, vectors]).tocsr()
+        neighbor_idx, neighbor_scores = extend_neighbor_table(
+            start.neighbor_idx, start.neighbor_scores, tfidf_matrix, start=start.tfidf_matrix.shape[0],
+        )
+        df = pd.concat([start.df, frame[CATALOG_COLUMNS]], ignore_index=True)
+        for column in ('Author', 'Genres'):
+            if isinstance(start.df[column].dtype, pd.CategoricalDtype):
+                df[column] = df[column].astype('category')
+
+        snapshot = RecommendationArtifacts(
+            df=df,
+            tfidf=self.tfidf,
+            tfidf_matrix=tfidf_matrix,
+            user_ids=self.user_ids,
+            book_ids=self.book_ids,
+            user_item_matrix=self.user_item_matrix,
+            user_factors=self.user_factors,
+            item_factors=self.item_factors,
+            neighbor_idx=neighbor_idx,
+            neighbor_scores=neighbor_scores,
+            content_index=start.content_index.extend(tfidf_matrix),
+            item_neighbor_idx=self.item_neighbor_idx,
+            item_neighbor_scores=self.item_neighbor_scores,
+            rating_user_ids=self.rating_user_ids,
+            rating_matrix=self.rating_matrix,
+            version=self.version,
+        )
+        snapshot.base = base
+        snapshot.live_records = live
+        snapshot.cache_version = f'{self.version}+{zlib.crc32(repr(live).encode()):08x}'
+
+        # Vocabulary drift, counted on unigrams (most n-grams are never in the vocabulary)
+        analyzer = self.tfidf.build_analyzer()
+        oov, total = start.live_terms
+        for text in frame['Content']:
+            words = [term for term in analyzer(text) if ' ' not in term]
+            total += len(words)
+            oov += sum(1 for word in words if word not in self.tfidf.vocabulary_)
+        snapshot.live_terms = (oov, total)
+        return snapshot
+
+    def build_lookups(self):
+        """Hash maps from ids to rows so serving never scans the frame"""
+        book_id_values = self.df['Book_ID'].to_numpy()
+        first = ~self.df['Book_ID'].duplicated().to_numpy()
+        first_rows = np.flatnonzero(first)
+
+        # Book_ID (as str, matching the loose ids callers pass) -> first df row
+        self.book_row = dict(zip(book_id_values[first].astype(str), first_rows.tolist()))
+        # User_ID -> row of user_factors / user_item_matrix, and of rating_matrix
+        self.user_row = {user_id: i for i, user_id in enumerate(self.user_ids)}
+        self.rating_user_row = {user_id: i for i, user_id in enumerate(self.rating_user_ids)}
+        # user_item column -> first df row for that Book_ID (-1 if absent)
+        positions = pd.Index(book_id_values[first]).get_indexer(self.book_ids)
+        self.column_row = np.where(positions >= 0, first_rows[positions], -1)
+        # df row -> user_item column for its Book_ID (-1 if nobody rated it)
+        self.row_column = pd.Index(self.book_ids).get_indexer(book_id_values)
+
+        # Rows sharing a cleaned title share a group id, for vectorized title dedup
+        self.title_group = pd.factorize(self.df['Clean_Title'])[0].astype(np.int32)
+        self.has_title = (self.df['Clean_Title'].str.len() > 0).to_numpy()
+        # Cleaned title -> first df row, to match site Books to dataset rows
+        titled = self.df.loc[self.has_title, 'Clean_Title']
+        titled = titled[~titled.duplicated()]
+        self.title_row = dict(zip(titled.to_numpy(), titled.index.tolist()))
+
+    def book_frame(self, rows):
+        """Book_ID, Title, Author and Genres of `rows` as a standalone frame"""
+        # Plain strings, so cached results don't carry the full category lists
+        return self.df.iloc[rows][BOOK_COLUMNS].astype({'Author': object, 'Genres': object})
+
+    @cached_property
+    def stats(self):
+        """Catalog aggregates for chat answers, computed once per snapshot"""
+        try:
+            from django.conf import settings
+            min_ratings = getattr(settings, 'RECOMMENDATION_TOP_RATED_MIN_COUNT', DEFAULT_MIN_RATINGS)
+        except Exception:
+            min_ratings = DEFAULT_MIN_RATINGS
+        return CatalogStats(self.df, min_ratings=min_ratings)
+
+    @cached_property
+    def popularity(self):
+        """Popularity ranking behind fallback recommendations, computed once per snapshot"""
+        return PopularityRanking(self.df, self.title_group)
+
+    @cached_property
+    def genres(self):
+        """Genre membership matrix aligned to df rows, for filtered recommendations"""
+        return GenreMatrix(self.df)
+
+    @cached_property
+    def search_index(self):
+        """Inverted token index for chatbot search, built once per snapshot"""
+        from .search_index import TokenIndex
+        return TokenIndex(self.df)
+
+    @classmethod
+    def fit(cls, df, index_backend='auto', index_params=None, ratings=None):
+        """Fit TF-IDF, the content index and the SVD factorization from a cleaned dataset frame.
+
+        `ratings` are the raw rating rows (read_ratings) the item-item
+        similarities are computed from; by default the frame's own rows.
+        """
+        tfidf = TfidfVectorizer(**TFIDF_PARAMS)
+        tfidf_matrix = tfidf.fit_transform(df['Content']).tocsr()
+        content_index = build_index(tfidf_matrix, backend=index_backend, **(index_params or {}))
+        neighbor_idx, neighbor_scores = build_neighbor_table(
+            tfidf_matrix, k=DEFAULT_NEIGHBORS, index=content_index,
+        )
+
+        # Build collaborative filtering model precompution using matrix factorization
+        user_ids, book_ids, user_item_matrix = build_user_item_matrix(df)
+        svd = TruncatedSVD(n_components=SVD_COMPONENTS, random_state=42)
+        user_factors = svd.fit_transform(user_item_matrix)
+        rating_user_ids, rating_matrix = build_rating_matrix(df, df if ratings is None else ratings)
+        item_neighbor_idx, item_neighbor_scores = build_item_neighbor_table(rating_matrix)
+
+        return cls(
+            df=df,
+            tfidf=tfidf,
+            tfidf_matrix=tfidf_matrix,
+            user_ids=user_ids,
+            book_ids=book_ids,
+            user_item_matrix=user_item_matrix,
+            user_factors=user_factors,
+            item_factors=svd.components_.T,
+            neighbor_idx=neighbor_idx,
+            neighbor_scores=neighbor_scores,
+            content_index=content_index,
+            item_neighbor_idx=item_neighbor_idx,
+            item_neighbor_scores=item_neighbor_scores,
+            rating_user_ids=rating_user_ids,
+            rating_matrix=rating_matrix,
+        )
+
+    def save(self, root=None, version=None):
+        """Write a new bundle version and point CURRENT at it; returns its path.
+
+        A snapshot with live books is saved as a live bundle: it names its
+        base bundle in the manifest and hard-links the files it shares with
+        it, so only the catalog, TF-IDF rows, neighbor tables and index are
+        written again.
+        """
+        root = root or artifacts_dir()
+        os.makedirs(root, exist_ok=True)
+        version = version or datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+        base_version = self.base.version if self.base is not None else self.base_version
+
+        # Write into a scratch directory first so readers never see a partial bundle
+        tmp_dir = os.path.join(root, f'.tmp-{version}')
+        os.makedirs(tmp_dir)
+        write_frame(self.df[CATALOG_COLUMNS], os.path.join(tmp_dir, 'catalog'))
+        save_csr(tmp_dir, 'tfidf_matrix', self.tfidf_matrix)
+        np.save(os.path.join(tmp_dir, 'neighbor_idx.npy'), self.neighbor_idx)
+        np.save(os.path.join(tmp_dir, 'neighbor_scores.npy'), self.neighbor_scores)
+        if base_version is None or not link_files(os.path.join(root, base_version), tmp_dir, BASE_FILES):
+            vocabulary = {term: int(i) for term, i in self.tfidf.vocabulary_.items()}
+            with open(os.path.join(tmp_dir, 'tfidf_vocabulary.json'), 'w', encoding='utf-8') as f:
+                json.dump(vocabulary, f, ensure_ascii=False)
+            np.save(os.path.join(tmp_dir, 'tfidf_idf.npy'), self.tfidf.idf_)
+            save_csr(tmp_dir, 'user_item', self.user_item_matrix)
+            np.save(os.path.join(tmp_dir, 'user_factors.npy'), self.user_factors)
+            np.save(os.path.join(tmp_dir, 'item_factors.npy'), self.item_factors)
+            np.save(os.path.join(tmp_dir, 'user_ids.npy'), np.asarray(self.user_ids))
+            np.save(os.path.join(tmp_dir, 'book_ids.npy'), np.asarray(self.book_ids))
+            np.save(os.path.join(tmp_dir, 'item_neighbor_idx.npy'), self.item_neighbor_idx)
+            np.save(os.path.join(tmp_dir, 'item_neighbor_scores.npy'), self.item_neighbor_scores)
+            save_csr(tmp_dir, 'ratings', self.rating_matrix)
+            np.save(os.path.join(tmp_dir, 'rating_user_ids.npy'), np.asarray(self.rating_user_ids, dtype=np.int64))
+        if base_version is not None:
+            with open(os.path.join(tmp_dir, LIVE_RECORDS_NAME), 'w', encoding='utf-8') as f:
+                json.dump(self.live_records, f, ensure_ascii=False)
+        for name, values in self.content_index.to_arrays().items():
+            np.save(os.path.join(tmp_dir, f'content_index.{name}.npy'), values)
+        index_params = {}
+        if hasattr(self.content_index, 'n_probe'):
+            index_params = {'n_probe': self.content_index.n_probe, 'rerank': self.content_index.rerank}
+
+        manifest = {
+            'format_version': ARTIFACT_FORMAT_VERSION,
+            'version': version,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'n_books': int(self.tfidf_matrix.shape[0]),
+            'n_users': len(self.user_ids),
+            'n_features': int(self.tfidf_matrix.shape[1]),
+            'svd_components': int(self.item_factors.shape[1]),
+            'content_neighbors': int(self.neighbor_idx.shape[1]),
+            'item_neighbors': int(self.item_neighbor_idx.shape[1]),
+            'content_index': {'backend': self.content_index.backend, 'params': index_params},
+            'base_version': base_version,
+            'live_books': len(self.live_records),
+            'live_terms': list(self.live_terms),
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        bundle_dir = os.path.join(root, version)
+        os.rename(tmp_dir, bundle_dir)
+
+        set_current_version(version, root)
+
+        self.version = version
+        self.cache_version = version
+        self.base_version = base_version
+        return bundle_dir
+
+    @classmethod
+    def load(cls, root=None, mmap_mode=mmap_mode, version=None, with_base=False):
+        """Load the bundle CURRENT (or `version`) names, or return None if there is none.
+
+        Large arrays are memory-mapped read-only by default, so every worker
+        on a host shares one copy of them through the page cache. Serving
+        never needs the base of a live bundle; `with_base` also loads it so
+        more site books can be appended (see sync_live_books).
+        """
+        root = root or artifacts_dir()
+        if callable(mmap_mode):
+            mmap_mode = mmap_mode()
+        version = version or read_current_version(root)
+        if version is None:
+            return None
+        bundle_dir = os.path.join(root, version)
+
+        with open(os.path.join(bundle_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+            logger.warning(
+                "Ignoring recommendation bundle %s: format %s, expected %s",
+                version, manifest.get('format_version'), ARTIFACT_FORMAT_VERSION,
+            )
+            return None
+
+        with open(os.path.join(bundle_dir, 'tfidf_vocabulary.json'), encoding='utf-8') as f:
+            vocabulary = json.load(f)
+        tfidf = restore_vectorizer(vocabulary, np.load(os.path.join(bundle_dir, 'tfidf_idf.npy')))
+        tfidf_matrix = load_csr(bundle_dir, 'tfidf_matrix', mmap_mode)
+
+        def load_array(name):
+            return np.load(os.path.join(bundle_dir, name), mmap_mode=mmap_mode)
+
+        index_spec = manifest['content_index']
+        index_arrays = {
+            name[len('content_index.'):-len('.npy')]: load_array(name)
+            for name in os.listdir(bundle_dir)
+            if name.startswith('content_index.')
+        }
+        content_index = INDEX_BACKENDS[index_spec['backend']].from_arrays(
+            tfidf_matrix, index_arrays, **index_spec['params'],
+        )
+
+        artifacts = cls(
+            df=read_frame(os.path.join(bundle_dir, 'catalog')),
+            tfidf=tfidf,
+            tfidf_matrix=tfidf_matrix,
+            user_ids=np.load(os.path.join(bundle_dir, 'user_ids.npy')).tolist(),
+            book_ids=np.load(os.path.join(bundle_dir, 'book_ids.npy')).tolist(),
+            user_item_matrix=load_csr(bundle_dir, 'user_item', mmap_mode),
+            user_factors=load_array('user_factors.npy'),
+            item_factors=load_array('item_factors.npy'),
+            neighbor_idx=load_array('neighbor_idx.npy'),
+            neighbor_scores=load_array('neighbor_scores.npy'),
+            content_index=content_index,
+            item_neighbor_idx=load_array('item_neighbor_idx.npy'),
+            item_neighbor_scores=load_array('item_neighbor_scores.npy'),
+            rating_user_ids=np.load(os.path.join(bundle_dir, 'rating_user_ids.npy')).tolist(),
+            rating_matrix=load_csr(bundle_dir, 'ratings', mmap_mode),
+            version=manifest['version'],
+        )
+        if manifest.get('base_version') is not None:
+            artifacts.base_version = manifest['base_version']
+            artifacts.live_terms = tuple(manifest['live_terms'])
+            with open(os.path.join(bundle_dir, LIVE_RECORDS_NAME), encoding='utf-8') as f:
+                artifacts.live_records = [tuple(record) for record in json.load(f)]
+            if with_base:
+                artifacts.base = cls.load(root, mmap_mode, version=artifacts.base_version)
+        return artifacts
+
+
+def prune_bundles(root=None, keep=3):
+    """Delete all but the newest `keep` bundle versions.
+
+    Never deletes the current one, nor the base of a kept live bundle.
+    """
+    root = root or artifacts_dir()
+    if not os.path.isdir(root):
+        return []
+    versions = sorted(
+        name for name in os.listdir(root)
+        if not name.startswith('.') and os.path.isdir(os.path.join(root, name))
+    )
+    kept = set(versions[-keep:] if keep > 0 else []) | {read_current_version(root)}
+    kept |= {(read_manifest(root, name) or {}).get('base_version') for name in kept if name}
+    removed = []
+    for name in versions:
+        if name in kept:
+            continue
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        removed.append(name)
+    return removed
+
+
+def load_or_fit_artifacts(root=None):
+    """Prefer the prebuilt bundle; fit in-process only when none exists"""
+    try:
+        artifacts = RecommendationArtifacts.load(root)
+    except Exception as e:
+        logger.warning("Could not load recommendation bundle, refitting: %s", e)
+        artifacts = None
+    if artifacts is None:
+        print("No recommendation bundle found; fitting model in-process. "
+              "Run 'manage.py build_recommendation_artifacts' to speed up startup.")
+        artifacts = RecommendationArtifacts.fit(load_dataset(), ratings=read_ratings())
+    return artifacts
+
+
+class ModelHolder:
+    """Serves the current RecommendationArtifacts and hot-swaps newer bundles.
+
+    Callers take one snapshot per request with get() and use it throughout,
+    so a request never mixes model versions. At most once per reload
+    interval get() stats the CURRENT pointer; when it names a new version
+    the bundle is loaded on a background thread and swapped in with a single
+    reference assignment. In-flight requests finish on the snapshot they
+    already hold, and nobody waits for the load. Site books reach workers
+    the same way, as live bundles written by `manage.py sync_live_books`.
+    """
+
+    def __init__(self, root=None, poll_interval=None):
+        self.root = root
+        self.poll_interval = poll_interval
+        self._current = None
+        self._lock = threading.Lock()
+        self._loader = None
+        self._next_check = 0.0
+        self._pointer_mtime = None
+
+    def _root(self):
+        return self.root or artifacts_dir()
+
+    def _interval(self):
+        return reload_interval() if self.poll_interval is None else self.poll_interval
+
+    def _stat_pointer(self):
+        try:
+            return os.stat(os.path.join(self._root(), CURRENT_POINTER)).st_mtime_ns
+        except OSError:
+            return None
+
+    @property
+    def version(self):
+        current = self._current
+        return current.version if current is not None else None
+
+    def get(self):
+        current = self._current
+        if current is None:
+            with self._lock:
+                if self._current is None:
+                    self._pointer_mtime = self._stat_pointer()
+                    self._current = load_or_fit_artifacts(self._root())
+                    self._next_check = time.monotonic() + self._interval()
+                return self._current
+        if time.monotonic() >= self._next_check:
+            self._check_for_update()
+        return current
+
+    def _check_for_update(self):
+        self._next_check = time.monotonic() + self._interval()
+        mtime = self._stat_pointer()
+        if mtime is None or mtime == self._pointer_mtime:
+            return
+        if read_current_version(self._root()) == self.version:
+            self._pointer_mtime = mtime
+            return
+        with self._lock:
+            if self._loader is not None and self._loader.is_alive():
+                return
+            self._loader = threading.Thread(
+                target=self._load_in_background, args=(mtime,),
+                name='recommendation-model-loader', daemon=True,
+            )
+            self._loader.start()
+
+    def _load_in_background(self, mtime):
+        try:
+            artifacts = RecommendationArtifacts.load(self._root())
+        except Exception:
+            logger.exception("Failed to load new recommendation bundle; keeping %s", self.version)
+            return
+        if artifacts is not None:
+            self.swap(artifacts)
+            self._pointer_mtime = mtime
+
+    def swap(self, artifacts):
+        """Atomically make `artifacts` the snapshot handed to new requests"""
+        previous = self.version
+        self._current = artifacts
+        logger.info("Recommendation model %s replaced by %s", previous, artifacts.version)
+
+    def reload(self):
+        """Synchronously load the bundle CURRENT points at and swap it in"""
+        mtime = self._stat_pointer()
+        artifacts = RecommendationArtifacts.load(self._root())
+        if artifacts is not None:
+            self.swap(artifacts)
+            self._pointer_mtime = mtime
+        return self.version
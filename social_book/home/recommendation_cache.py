@@ -0,0 +1,82 @@
+"""Cache keys for per-user recommendation state.
+
+Kept free of the ML stack so signal handlers can invalidate entries
+without importing the model.
+
+Finished recommendation lists and per-user model state (fold-in vectors,
+shelf profiles) live in the 'recommendations' cache (see CACHES in
+settings) under keys that include the model version and a per-user
+generation. Loading a new model or changing a user's reviews or shelf
+therefore makes old entries unreachable in every worker; the backend's
+TTL and size limit evict them.
+"""
+import time
+
+from django.core.cache import InvalidCacheBackendError, caches
+
+RESULTS_CACHE = 'recommendations'
+
+HITS_KEY = 'recommendation:stats:hits'
+MISSES_KEY = 'recommendation:stats:misses'
+
+
+def results_cache():
+    try:
+        return caches[RESULTS_CACHE]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def user_generation_key(user_id):
+    return f'recommendation:generation:{user_id}'
+
+
+def user_generation(user_id):
+    """Current generation of a user's cached results (0 for anonymous requests).
+
+    A missing generation is seeded with the clock rather than 0, so results
+    cached before the key was evicted can never be served again.
+    """
+    if user_id is None:
+        return 0
+    return results_cache().get_or_set(user_generation_key(user_id), time.time_ns, timeout=None)
+
+
+def bump_user_generation(user_id):
+    """Invalidate every cached result for this user"""
+    results_cache().set(user_generation_key(user_id), time.time_ns(), timeout=None)
+
+
+def foldin_cache_key(user_id, model_version):
+    return f'recommendation:foldin:{model_version}:{user_id}:{user_generation(user_id)}'
+
+
+def shelf_cache_key(user_id, model_version):
+    return f'recommendation:shelf:{model_version}:{user_id}:{user_generation(user_id)}'
+
+
+def result_cache_key(user_id, book_id, n, model_version, genre=None, exclude_seen=False):
+    generation = user_generation(user_id)
+    genre = str(genre).strip().lower().replace(' ', '_') if genre else ''
+    return (f'recommendation:result:{model_version}:{user_id}:{generation}:{book_id}:{n}'
+            f':{genre}:{int(exclude_seen)}')
+
+
+def record_lookup(hit):
+    results = results_cache()
+    key = HITS_KEY if hit else MISSES_KEY
+    results.add(key, 0, timeout=None)
+    try:
+        results.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        results.set(key, 1, timeout=None)
+
+
+def cache_stats():
+    """Hit/miss counters for the recommendation result cache"""
+    counts = results_cache().get_many([HITS_KEY, MISSES_KEY])
+    hits = counts.get(HITS_KEY, 0)
+    misses = counts.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else 0.0}
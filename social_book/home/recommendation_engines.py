@@ -0,0 +1,220 @@
+"""Pluggable recommendation engines run under per-engine latency budgets.
+
+Each engine turns an EngineRequest into a frame of candidates (Book_ID,
+Title, Author, Genres and optionally a score column). The hybrid
+recommender runs every primary engine that applies to the request,
+concurrently on a small thread pool (NumPy/SciPy release the GIL), and
+merges whatever finished within its budget and the overall deadline. A
+late engine is simply left out of that answer. Fallback engines only run,
+inline, when the primaries found fewer than n books.
+
+Budgets, the deadline and the pool size come from settings
+(RECOMMENDATION_ENGINE_BUDGETS, RECOMMENDATION_DEADLINE,
+RECOMMENDATION_ENGINE_THREADS); with no threads engines run inline and
+are skipped once the deadline has passed. Pool threads open their own
+database connections and close them around every engine call, like
+Django does around a request.
+
+A late engine can't be interrupted: it keeps its pool thread until it
+returns. So engines are only submitted while a thread is free; when the
+pool is saturated they are skipped (and counted) rather than queued
+behind slow ones, which would make them miss their budgets too. Size
+RECOMMENDATION_ENGINE_THREADS for the number of primary engines times
+the requests a worker serves concurrently.
+
+Engines register on the module-level `engines` registry, so its statistics
+can be read (e.g. by the admin stats view) without importing the model.
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import bisect
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET = 0.25  # seconds
+DEFAULT_DEADLINE = 0.5
+DEFAULT_THREADS = 4
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+EngineRequest = namedtuple('EngineRequest', ['user_id', 'book_id', 'n', 'allowed'])
+Engine = namedtuple('Engine', ['name', 'func', 'kind', 'score_column', 'requires', 'fallback'])
+
+
+class EngineStats:
+    """Latency histogram and timeout/error/skip counts for one engine"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.skipped = 0  # pool saturated
+
+    def snapshot(self):
+        labels = [f'<={bound}ms' for bound in LATENCY_BUCKETS_MS] + [f'>{LATENCY_BUCKETS_MS[-1]}ms']
+        return {
+            'calls': self.calls,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'skipped': self.skipped,
+            'latency': dict(zip(labels, self.buckets)),
+        }
+
+
+class EngineRegistry:
+    """Named engines plus their per-process latency statistics"""
+
+    def __init__(self):
+        self.engines = []
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._threads = 0
+        self._in_flight = 0
+
+    def register(self, name, kind, score_column=None, requires=None, fallback=False):
+        """Decorator adding `func(model, request) -> frame` as an engine.
+
+        `kind` is the Type label of its results, `requires` the request
+        field ('user_id' or 'book_id') it needs to run.
+        """
+        def decorator(func):
+            self.engines = [engine for engine in self.engines if engine.name != name]
+            self.engines.append(Engine(name, func, kind, score_column, requires, fallback))
+            self._stats.setdefault(name, EngineStats())
+            return func
+        return decorator
+
+    def stats(self):
+        """Per-engine calls, timeouts, errors and latency histogram"""
+        with self._stats_lock:
+            return {name: stats.snapshot() for name, stats in self._stats.items()}
+
+    def _record(self, name, elapsed_ms=None, timeout=False, error=False, skipped=False):
+        with self._stats_lock:
+            stats = self._stats.setdefault(name, EngineStats())
+            if elapsed_ms is not None:
+                stats.calls += 1
+                stats.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+            stats.timeouts += timeout
+            stats.errors += error
+            stats.skipped += skipped
+
+    def _executor(self):
+        threads = getattr(settings, 'RECOMMENDATION_ENGINE_THREADS', DEFAULT_THREADS)
+        if not threads:
+            return None
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='recommendation-engine')
+                    self._threads = threads
+        return self._pool
+
+    def _submit(self, pool, engine, model, request):
+        """Future running `engine` on a free pool thread, or None if every thread is busy"""
+        with self._pool_lock:
+            if self._in_flight >= self._threads:
+                return None
+            self._in_flight += 1
+        future = pool.submit(self._call_in_pool, engine, model, request)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._pool_lock:
+            self._in_flight -= 1
+
+    def _call_in_pool(self, engine, model, request):
+        close_old_connections()
+        try:
+            return self._call(engine, model, request)
+        finally:
+            close_old_connections()
+
+    def _call(self, engine, model, request):
+        started = time.perf_counter()
+        try:
+            return engine.func(model, request)
+        except Exception:
+            self._record(engine.name, error=True)
+            raise
+        finally:
+            self._record(engine.name, elapsed_ms=(time.perf_counter() - started) * 1000)
+
+    def run(self, model, request):
+        """(parts, complete): (frame, kind, score column) per engine that finished in time.
+
+        `complete` is False when an engine timed out or failed, so callers
+        can avoid caching a degraded answer.
+        """
+        budgets = getattr(settings, 'RECOMMENDATION_ENGINE_BUDGETS', {})
+        started = time.monotonic()
+        deadline = started + getattr(settings, 'RECOMMENDATION_DEADLINE', DEFAULT_DEADLINE)
+        primaries = [
+            engine for engine in self.engines
+            if not engine.fallback and (engine.requires is None or getattr(request, engine.requires) is not None)
+        ]
+
+        parts = []
+        complete = True
+        pool = self._executor()
+        futures = []
+        for engine in primaries:
+            future = None
+            if pool is not None:
+                future = self._submit(pool, engine, model, request)
+                if future is None:
+                    self._record(engine.name, skipped=True)
+                    logger.warning("Recommendation engine pool is saturated; skipped %s", engine.name)
+                    complete = False
+                    continue
+            futures.append((engine, future))
+
+        for engine, future in futures:
+            # Absolute time limits, so waiting on engines one by one doesn't add up
+            limit = min(started + budgets.get(engine.name, DEFAULT_BUDGET), deadline)
+            try:
+                if future is not None:
+                    frame = future.result(timeout=max(0.0, limit - time.monotonic()))
+                elif time.monotonic() < deadline:
+                    frame = self._call(engine, model, request)
+                else:
+                    raise TimeoutError
+            except TimeoutError:
+                # Still running: it keeps its thread until it returns
+                self._record(engine.name, timeout=True)
+                logger.warning("Recommendation engine %s missed its budget", engine.name)
+                complete = False
+                continue
+            except Exception:
+                logger.exception("Recommendation engine %s failed", engine.name)
+                complete = False
+                continue
+            parts.append((frame, engine.kind, engine.score_column))
+
+        found = {book_id for frame, _, _ in parts for book_id in frame['Book_ID'].tolist()}
+        for engine in self.engines:
+            if not engine.fallback or len(found) >= request.n:
+                continue
+            try:
+                frame = self._call(engine, model, request)
+            except Exception:
+                logger.exception("Recommendation engine %s failed", engine.name)
+                complete = False
+                continue
+            parts.append((frame, engine.kind, engine.score_column))
+            found.update(frame['Book_ID'].tolist())
+        return parts, complete
+
+
+# Shared by every engine in the process (see recommendation_model)
+engines = EngineRegistry()
@@ -1,268 +1,472 @@
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.decomposition import TruncatedSVD
 import re
-import os
-
-# Step 2: Load and Clean the Dataset
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-dataset_path = os.path.join(BASE_DIR, 'static', 'assets', 'dataset', 'Final_Dataset.csv')
-df = pd.read_csv(dataset_path)
-
-# Step 3: Clean and Combine Content Fields with better handling
-def clean_text(text):
-    if pd.isna(text):
-        return ""
-    text = str(text).lower()
-    text = re.sub(r'[^\w\s]', '', text)  # Remove punctuation
-    text = re.sub(r'\s+', ' ', text).strip()  # Normalize whitespace
-    return text
-
-# First remove exact duplicates from dataset
-df = df.drop_duplicates(subset=['Title', 'Author'], keep='first')
-
-df['Clean_Title'] = df['Title'].apply(clean_text)
-df['Clean_Author'] = df['Author'].apply(clean_text)
-df['Clean_Genres'] = df['Genres'].apply(lambda x: clean_text(str(x).replace('|', ' ')))
-
-# More balanced weighted combination
-df['Content'] = (
-    df['Clean_Title'] * 3 + ' ' +  # Highest weight to title
-    df['Clean_Author'] * 2 + ' ' +  # Medium weight to author
-    df['Clean_Genres']  # Lower weight to genres
-)
-
-# Step 4: TF-IDF Vectorization with adjusted parameters
-tfidf = TfidfVectorizer(
-    stop_words='english',
-    ngram_range=(1, 3),  # Wider ngram range to capture more context
-    min_df=3,  # Higher min_df to filter out rare terms
-    max_features=10000  # Limit features to most important ones
-)
-tfidf_matrix = tfidf.fit_transform(df['Content'])
-
-# Build collaborative filtering model precompution using matrix factorization
-user_item = df.pivot_table(index='User_ID', columns='Book_ID', values='Rating', fill_value=0)
-user_ids = user_item.index.tolist()
-book_ids = user_item.columns.tolist()
-user_item_matrix = user_item.values
-svd = TruncatedSVD(n_components=20, random_state=42)
-user_factors = svd.fit_transform(user_item_matrix)
-item_factors = svd.components_.T
+import threading
+
+from django.conf import settings
+
+from .content_index import top_k
+from django.db.models import Q
+
+from .models import Book, ReadingStatus, Review, UserRecommendation
+from .qa_service import QAUnavailable, get_qa_service
+from .recommendation_artifacts import ModelHolder, clean_text
+from .recommendation_cache import foldin_cache_key, record_lookup, result_cache_key, results_cache, shelf_cache_key
+from .recommendation_engines import EngineRequest, engines
+
+# Step 2-4: The prebuilt bundle (cleaned dataset, TF-IDF, SVD factors, content
+# neighbors and id lookups) lives in a RecommendationArtifacts snapshot; see
+# recommendation_artifacts.py and `manage.py build_recommendation_artifacts`.
+# The holder swaps in newer bundles without a restart, so every function
+# below works on one snapshot (`model`) taken at the start of a request.
+# Nothing is loaded at import time: the first request (or warmup()) does it.
+# Books added on the site arrive as live bundles (see `manage.py sync_live_books`).
+model_holder = ModelHolder()
+
+# Minimum cosine similarity for a content recommendation
+MIN_SIMILARITY = 0.1
 
 #Step 5: Content based Similarity
-def content_based_recommendations(book_id, n=5):
-    """Original function interface - maintains compatibility with your existing views.py"""
+def _select_candidates(model, candidates, scores, exclude_group, n, allowed=None):
+    """First n candidates (best first) above the threshold with distinct titles"""
+    groups = model.title_group[candidates]
+    keep = (scores > MIN_SIMILARITY) & (groups != exclude_group)
+    if allowed is not None:
+        keep &= allowed[candidates]
+    candidates, scores, groups = candidates[keep], scores[keep], groups[keep]
+    # np.unique gives the first (best scoring) position of every title group
+    _, first = np.unique(groups, return_index=True)
+    first = np.sort(first)[:n]
+    return candidates[first], scores[first]
+
+def content_based_recommendations(book_id, n=5, model=None, allowed=None):
+    """Original function interface - maintains compatibility with your existing views.py.
+
+    `allowed` is an optional boolean mask over model rows (see filter_mask).
+    """
+    model = model or model_holder.get()
     try:
         # Convert book_id to string if needed
         book_id = str(book_id)
         
         # Validate book exists
-        if book_id not in df['Book_ID'].astype(str).values:
+        book_index = model.book_row.get(book_id)
+        if book_index is None:
             print(f"Book ID {book_id} not found. Trying title search...")
-            return get_fallback_recommendations(n)
-        
-        book_index = df[df['Book_ID'].astype(str) == book_id].index[0]
+            return get_fallback_recommendations(n, model=model, allowed=allowed)
         
         # Special character handling in title matching
-        current_title = clean_text(df.iloc[book_index]['Title'])
-        if not current_title or current_title.strip() == "":
+        if not model.has_title[book_index]:
             print("Invalid title format, using fallback")
-            return get_fallback_recommendations(n)
+            return get_fallback_recommendations(n, model=model, allowed=allowed)
+        current_group = model.title_group[book_index]
         
-        # Safe similarity calculation
-        cosine_sim = cosine_similarity(tfidf_matrix[book_index:book_index+1], tfidf_matrix).flatten()
-        
-        # Get recommendations with similarity threshold
-        recommendations = []
-        seen_titles = {current_title}
-        
-        for idx in cosine_sim.argsort()[::-1]:
-            if len(recommendations) >= n:
-                break
-            candidate_title = clean_text(df.iloc[idx]['Title'])
-            similarity = cosine_sim[idx]
-            
-            if (idx != book_index and 
-                candidate_title not in seen_titles and 
-                similarity > 0.1):  # Minimum similarity threshold
-                seen_titles.add(candidate_title)
-                recommendations.append(idx)
+        # Candidates come from the precomputed neighbor table, best first
+        recommendations, scores = _select_candidates(
+            model, model.neighbor_idx[book_index], model.neighbor_scores[book_index], current_group, n, allowed
+        )
+        if len(recommendations) < n and allowed is not None:
+            # Filters emptied the neighbor list: score every book with one sparse
+            # mat-vec and mask before taking the top k
+            all_scores = np.asarray((model.tfidf_matrix @ model.tfidf_matrix[book_index].T).todense()).ravel()
+            all_scores[~allowed] = -np.inf
+            idx = top_k(all_scores, model.neighbor_idx.shape[1] + 10 * n)
+            recommendations, scores = _select_candidates(model, idx, all_scores[idx], current_group, n)
+        elif len(recommendations) < n:
+            # Neighbor table exhausted (e.g. many editions of one title); widen through the index
+            idx, idx_scores = model.content_index.search(
+                model.tfidf_matrix[book_index], model.neighbor_idx.shape[1] + 10 * n
+            )
+            recommendations, scores = _select_candidates(model, idx, idx_scores, current_group, n)
         
-        if not recommendations:
+        if not len(recommendations):
             print("No sufficiently similar books found, using fallback")
-            return get_fallback_recommendations(n)
+            return get_fallback_recommendations(n, model=model, allowed=allowed)
             
-        result = df.iloc[recommendations][['Book_ID', 'Title', 'Author', 'Genres']].copy()
-        result['Similarity_Score'] = cosine_sim[recommendations]
+        result = model.book_frame(recommendations)
+        result['Similarity_Score'] = scores
         return result.reset_index(drop=True)
         
     except Exception as e:
         print(f"Recommendation error: {str(e)}")
-        return get_fallback_recommendations(n)
+        return get_fallback_recommendations(n, model=model, allowed=allowed)
 
-def get_fallback_recommendations(n=5):
-    """Return popular books when specific recommendations fail"""
-    return df.sample(n=n)[['Book_ID', 'Title', 'Author', 'Genres']]
+def get_fallback_recommendations(n=5, model=None, genre=None, seed=None, allowed=None):
+    """Return popular books when specific recommendations fail.
+
+    Read from the head of the precomputed popularity ranking, so the answer
+    is deterministic (per seed) and cacheable.
+    """
+    model = model or model_holder.get()
+    return model.book_frame(model.popularity.top(n, genre=genre, seed=seed, allowed=allowed))
 
 #Step 6: Collaborative filtering
-def collaborative_recommendations(user_id, n=5):
-    """Collaborative filtering recommendations"""
+def fold_in_user(user_id, model=None):
+    """Factor vector for a site user from their live Review ratings.
+
+    Projects the user's ratings onto item_factors (what svd.transform would
+    do) instead of refitting. Cached per user, model version and user
+    generation, which a signal bumps whenever the user's reviews change.
+    Returns (user_vector, rated_columns, ratings), or None if no review
+    maps onto the dataset.
+    """
+    model = model or model_holder.get()
+    results = results_cache()
+    key = foldin_cache_key(user_id, model.version)
+    cached = results.get(key)
+    if cached is not None:
+        return cached[0]
+
+    ratings = {}
+    for book_name, rating in Review.objects.filter(user_id=user_id).values_list('book_id__book_name', 'rating'):
+        row = model.title_row.get(clean_text(book_name))
+        if row is not None and model.row_column[row] >= 0:
+            ratings[model.row_column[row]] = rating
+
+    folded = None
+    if ratings:
+        rated = np.fromiter(ratings.keys(), dtype=np.int64)
+        values = np.fromiter(ratings.values(), dtype=np.float64)
+        folded = (values @ model.item_factors[rated], rated, values)
+    # Wrapped so a user with no usable reviews (None) is cached too
+    results.set(key, (folded,))
+    return folded
+
+def precomputed_recommendations(user_id, n=5, model=None):
+    """Top-n from the UserRecommendation table for this model's factors, or None if not stored"""
+    model = model or model_holder.get()
+    stored = list(
+        UserRecommendation.objects
+        .filter(dataset_user_id=user_id, model_version=model.factor_version, rank__lt=n)
+        .order_by('rank')
+        .values_list('dataset_book_id', 'score')
+    )
+    if len(stored) < n:
+        return None
+    rows = [model.book_row.get(str(book_id)) for book_id, _ in stored]
+    found = [i for i, row in enumerate(rows) if row is not None]
+    if not found:
+        return None
+    result = model.book_frame([rows[i] for i in found])
+    result['Predicted_Rating'] = [stored[i][1] for i in found]
+    return result.reset_index(drop=True)
+
+def collaborative_recommendations(user_id, n=5, model=None, allowed=None):
+    """Collaborative filtering recommendations, optionally limited to `allowed` rows"""
+    model = model or model_holder.get()
     try:
-        if user_id not in user_ids:
-            return get_fallback_recommendations(n)
+        uidx = model.user_row.get(user_id)
+        if uidx is not None:
+            # Served from the offline batch when precompute_user_recommendations has run
+            # (it holds unfiltered lists, so filtered requests are scored live)
+            precomputed = None if allowed is not None else precomputed_recommendations(user_id, n, model=model)
+            if precomputed is not None:
+                return precomputed
+            user_vector = model.user_factors[uidx]
+            # Mask the books this user already rated, straight from the sparse row
+            user_item_matrix = model.user_item_matrix
+            rated = user_item_matrix.indices[user_item_matrix.indptr[uidx]:user_item_matrix.indptr[uidx + 1]]
+        else:
+            # Not in the training data: fold in the user's reviews from the site
+            folded = fold_in_user(user_id, model=model)
+            if folded is None:
+                return get_fallback_recommendations(n, model=model, allowed=allowed)
+            user_vector, rated, _ = folded
         
-        uidx = user_ids.index(user_id)
-        preds = np.dot(user_factors[uidx], item_factors.T)
-        unrated = user_item_matrix[uidx] == 0
-        rec_idx = np.argsort(preds * unrated)[::-1][:n]
+        preds = np.dot(user_vector, model.item_factors.T)
+        scores = preds.copy()
+        scores[rated] = -np.inf
+        if allowed is not None:
+            # Columns without a catalog row (column_row -1) can never be shown
+            scores[~(allowed[model.column_row] & (model.column_row >= 0))] = -np.inf
+        rec_idx = top_k(scores, n)
+        rec_idx = rec_idx[np.isfinite(scores[rec_idx])]
         
-        recommendations = []
-        for i in rec_idx:
-            bookid = book_ids[i]
-            book_matches = df[df['Book_ID'] == bookid]
-            if not book_matches.empty:
-                recommendations.append(book_matches.index[0])
+        rows = model.column_row[rec_idx]
+        found = rows >= 0
+        recommendations = rows[found]
         
-        if recommendations:
-            result = df.iloc[recommendations][['Book_ID', 'Title', 'Author', 'Genres']].copy()
-            result['Predicted_Rating'] = preds[rec_idx[:len(recommendations)]]
+        if len(recommendations):
+            result = model.book_frame(recommendations)
+            result['Predicted_Rating'] = preds[rec_idx[found]]
             return result.reset_index(drop=True)
         else:
-            return get_fallback_recommendations(n)
+            return get_fallback_recommendations(n, model=model, allowed=allowed)
     except:
-        return get_fallback_recommendations(n)
+        return get_fallback_recommendations(n, model=model, allowed=allowed)
+
+def item_knn_recommendations(user_id, n=5, model=None, allowed=None):
+    """Item-item recommendations from the precomputed rating-neighbor lists.
+
+    Sums the neighbor lists of the books the user rated, weighted by
+    similarity and rating, so the work grows with the user's history rather
+    than the catalog. Dataset users are read from every raw rating row,
+    site users from their folded-in reviews. Returns None when the user has
+    no usable ratings.
+    """
+    model = model or model_holder.get()
+    uidx = model.rating_user_row.get(user_id)
+    if uidx is not None:
+        rating_matrix = model.rating_matrix
+        span = slice(rating_matrix.indptr[uidx], rating_matrix.indptr[uidx + 1])
+        rated, ratings = rating_matrix.indices[span], rating_matrix.data[span]
+    else:
+        folded = fold_in_user(user_id, model=model)
+        if folded is None:
+            return None
+        _, columns, ratings = folded
+        rated = model.column_row[columns]
+        rated, ratings = rated[rated >= 0], ratings[rated >= 0]
+
+    neighbors = model.item_neighbor_idx[rated].ravel()
+    weights = (model.item_neighbor_scores[rated] * ratings[:, None]).ravel()
+    keep = weights > 0
+    rows, inverse = np.unique(neighbors[keep], return_inverse=True)
+    scores = np.bincount(inverse, weights=weights[keep], minlength=len(rows))
+
+    # Never recommend (another edition of) a book the user already rated
+    valid = ~np.isin(model.title_group[rows], model.title_group[rated])
+    if allowed is not None:
+        valid &= allowed[rows]
+    rows, scores = rows[valid], scores[valid]
+    if not len(rows):
+        return None
+
+    best = top_k(scores, n)
+    result = model.book_frame(rows[best])
+    result['Item_Score'] = scores[best]
+    return result.reset_index(drop=True)
+
+# Weight of a shelved book in the shelf profile, by reading status; a review
+# adds (rating - 3) / 2, so a 1-star review pushes the profile away
+SHELF_WEIGHTS = {'read': 1.0, 'reading': 1.0, 'want_to_read': 0.5}
+
+def shelf_profile(user_id, model=None):
+    """Weighted TF-IDF profile of everything on the site user's shelf.
+
+    Sums the rows of shelved and reviewed books, weighted by status and
+    rating. Cached in the results cache per user generation and model
+    version, so ReadingStatus or Review changes make it unreachable in every
+    worker. Returns (dense n_features profile, shelved rows), or None if
+    nothing maps onto the catalog.
+    """
+    model = model or model_holder.get()
+    results = results_cache()
+    key = shelf_cache_key(user_id, model.cache_version)
+    cached = results.get(key)
+    if cached is not None:
+        return cached[0]
+
+    weights = {}
+    shelved = ReadingStatus.objects.filter(user_id=user_id).values_list('book__book_name', 'status')
+    reviewed = Review.objects.filter(user_id=user_id).values_list('book_id__book_name', 'rating')
+    for entries, weight in ((shelved, SHELF_WEIGHTS.get), (reviewed, lambda rating: (rating - 3) / 2)):
+        for book_name, value in entries:
+            row = model.title_row.get(clean_text(book_name))
+            if row is not None:
+                weights[row] = weights.get(row, 0.0) + weight(value)
+
+    profile = None
+    if weights:
+        rows = np.fromiter(weights.keys(), dtype=np.int64)
+        values = np.fromiter(weights.values(), dtype=np.float64)
+        vector = np.asarray(values @ model.tfidf_matrix[rows]).ravel()
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            profile = (vector / norm, rows)
+    # Wrapped so an empty shelf (None) is cached too
+    results.set(key, (profile,))
+    return profile
+
+def shelf_recommendations(user_id, n=5, model=None, allowed=None):
+    """Books closest to the user's whole shelf: one sparse mat-vec however long it is"""
+    model = model or model_holder.get()
+    profile = shelf_profile(user_id, model=model)
+    if profile is None:
+        return get_fallback_recommendations(n, model=model, seed=user_id, allowed=allowed)
+    vector, rows = profile
+
+    scores = model.tfidf_matrix @ vector
+    # Never recommend (another edition of) a book already on the shelf
+    scores[np.isin(model.title_group, model.title_group[rows])] = -np.inf
+    if allowed is not None:
+        scores[~allowed] = -np.inf
+    idx = top_k(scores, 10 * n)
+    recommendations, similarity = _select_candidates(model, idx, scores[idx], -1, n)
+    if not len(recommendations):
+        return get_fallback_recommendations(n, model=model, seed=user_id, allowed=allowed)
+
+    result = model.book_frame(recommendations)
+    result['Similarity_Score'] = similarity
+    return result.reset_index(drop=True)
+
+def seen_rows(user_id, model=None):
+    """Boolean mask of rows the site user has marked read or reviewed, from one query"""
+    model = model or model_holder.get()
+    names = (
+        Book.objects
+        .filter(Q(reading_statuses__user_id=user_id, reading_statuses__status='read') | Q(reviews__user_id=user_id))
+        .values_list('book_name', flat=True)
+        .distinct()
+    )
+    rows = [model.title_row.get(clean_text(name)) for name in names]
+    groups = [model.title_group[row] for row in rows if row is not None]
+    # Every edition of a seen title is excluded, not just the first row
+    return np.isin(model.title_group, groups)
+
+def filter_mask(model, genre=None, exclude_seen_by=None):
+    """Rows a filtered request may return, or None when nothing is filtered"""
+    allowed = None
+    if genre:
+        allowed = model.genres.mask(genre)
+    if exclude_seen_by is not None:
+        unseen = ~seen_rows(exclude_seen_by, model=model)
+        allowed = unseen if allowed is None else allowed & unseen
+    return allowed
+
+# Engines merged by HybridBookBot, each run under its latency budget
+# (see recommendation_engines.py); popularity only fills in when the others
+# come up short
+@engines.register('content', 'content', 'Similarity_Score', requires='book_id')
+def content_engine(model, request):
+    return content_based_recommendations(request.book_id, request.n, model=model, allowed=request.allowed)
+
+@engines.register('collaborative', 'collaborative', 'Predicted_Rating', requires='user_id')
+def collaborative_engine(model, request):
+    return collaborative_recommendations(request.user_id, request.n, model=model, allowed=request.allowed)
+
+@engines.register('item_knn', 'item_knn', 'Item_Score', requires='user_id')
+def item_knn_engine(model, request):
+    result = item_knn_recommendations(request.user_id, request.n, model=model, allowed=request.allowed)
+    return result if result is not None else model.book_frame([])
+
+@engines.register('popularity', 'fallback', fallback=True)
+def popularity_engine(model, request):
+    # Rotated per user so users see different (but stable) popular books
+    return get_fallback_recommendations(request.n, model=model, seed=request.user_id, allowed=request.allowed)
 
 # Step 7:Combine both filtering technique
+# Type priority when ordering hybrid results
+TYPE_RANK = {'content': 0, 'collaborative': 1, 'item_knn': 2, 'fallback': 3, 'emergency_fallback': 4}
+RESULT_COLUMNS = ['Book_ID', 'Title', 'Author', 'Genres', 'Type', 'Score']
+
+def _empty_results():
+    """No recommendations, with the usual columns and dtypes"""
+    return pd.DataFrame({
+        'Book_ID': np.empty(0, dtype=np.int64),
+        **{name: np.empty(0, dtype=object) for name in ['Title', 'Author', 'Genres', 'Type']},
+        'Score': np.empty(0),
+    }, columns=RESULT_COLUMNS)
+
+def _merge_results(parts, n):
+    """Top n of the concatenated parts: one dedup by Book_ID (first source wins),
+    then one sort by type priority and descending score"""
+    columns = {'Book_ID': np.concatenate([frame['Book_ID'].to_numpy(dtype=np.int64) for frame, _, _ in parts])}
+    for name in ['Title', 'Author', 'Genres']:
+        columns[name] = np.concatenate([frame[name].to_numpy(dtype=object) for frame, _, _ in parts])
+    columns['Type'] = np.concatenate([np.full(len(frame), kind, dtype=object) for frame, kind, _ in parts])
+    columns['Score'] = np.concatenate([
+        frame[score].to_numpy(dtype=np.float64) if score in frame else np.zeros(len(frame))
+        for frame, _, score in parts
+    ])
+    if not len(columns['Book_ID']):
+        return _empty_results()
+
+    _, first = np.unique(columns['Book_ID'], return_index=True)
+    first = np.sort(first)
+    ranks = np.array([TYPE_RANK.get(kind, len(TYPE_RANK)) for kind in columns['Type'][first]])
+    selected = first[np.lexsort((-columns['Score'][first], ranks))][:n]
+    return pd.DataFrame({name: values[selected] for name, values in columns.items()},
+                        columns=RESULT_COLUMNS, index=selected)
+
 class HybridBookBot:
     """Enhanced class for chatbot functionality"""
-    def __init__(self):
-        # Use the global variables already initialized
-        self.df = df
-        self.tfidf_matrix = tfidf_matrix
-        self.content_sim = cosine_similarity(tfidf_matrix)
-        
-        # Initialize QA pipeline with error handling
-        try:
-            from transformers import pipeline
-            self.qa_pipeline = pipeline("question-answering", model="distilbert-base-cased-distilled-squad")
-        except Exception as e:
-            print(f"Warning: Could not load QA pipeline: {e}")
-            self.qa_pipeline = None
 
-    def recommend(self, user_id=None, book_id=None, n=5):
-        """Hybrid recommendations with comprehensive fallbacks"""
+    @property
+    def df(self):
+        """Dataset frame of the model currently being served"""
+        return model_holder.get().df
+
+    def recommend(self, user_id=None, book_id=None, n=5, genre=None, exclude_seen=False):
+        """Hybrid recommendations with comprehensive fallbacks, cached per model version.
+
+        `genre` keeps only books listing that genre; `exclude_seen` drops books
+        the user marked read or reviewed on the site.
+        """
+        # One snapshot for the whole request, even if a new model is swapped in meanwhile
+        model = model_holder.get()
+        results = results_cache()
+        exclude_seen = exclude_seen and user_id is not None
+        key = result_cache_key(user_id, book_id, n, model.cache_version, genre=genre, exclude_seen=exclude_seen)
+        cached = results.get(key)
+        record_lookup(cached is not None)
+        if cached is not None:
+            return cached.copy()
+
+        recommendations, complete = self._recommend(model, user_id, book_id, n, genre, exclude_seen)
+        # A list missing an engine that ran out of time is served but not cached
+        if complete:
+            results.set(key, recommendations)
+        return recommendations
+
+    def _recommend(self, model, user_id, book_id, n, genre=None, exclude_seen=False):
+        """(recommendations, complete) merged from the engines that finished in time"""
         try:
-            results = []
-            
-            # Content-based recommendations (if book_id provided)
-            if book_id is not None:
-                try:
-                    content_recs = content_based_recommendations(book_id, n)
-                    if not content_recs.empty:
-                        for _, row in content_recs.iterrows():
-                            results.append({
-                                'Book_ID': row['Book_ID'],
-                                'Title': row['Title'],
-                                'Author': row['Author'],
-                                'Genres': row['Genres'],
-                                'Type': 'content',
-                                'Score': row.get('Similarity_Score', 0)
-                            })
-                except Exception as e:
-                    print(f"Content-based failed: {e}")
-            
-            # Collaborative filtering (if user_id provided)
-            if user_id is not None:
-                try:
-                    collab_recs = collaborative_recommendations(user_id, n)
-                    if not collab_recs.empty:
-                        for _, row in collab_recs.iterrows():
-                            results.append({
-                                'Book_ID': row['Book_ID'],
-                                'Title': row['Title'],
-                                'Author': row['Author'],
-                                'Genres': row['Genres'],
-                                'Type': 'collaborative',
-                                'Score': row.get('Predicted_Rating', 0)
-                            })
-                except Exception as e:
-                    print(f"Collaborative failed: {e}")
-            
-            # If we have results, remove duplicates
-            if results:
-                results_df = pd.DataFrame(results)
-                results_df = results_df.drop_duplicates(subset=['Book_ID'])
-            else:
-                results_df = pd.DataFrame()
-            
-            # Fallback if not enough results
-            if len(results_df) < n:
-                needed = n - len(results_df)
-                try:
-                    fallback = get_fallback_recommendations(needed)
-                    for _, row in fallback.iterrows():
-                        results_df = pd.concat([
-                            results_df,
-                            pd.DataFrame([{
-                                'Book_ID': row['Book_ID'],
-                                'Title': row['Title'],
-                                'Author': row['Author'],
-                                'Genres': row['Genres'],
-                                'Type': 'fallback',
-                                'Score': 0
-                            }])
-                        ], ignore_index=True)
-                except Exception as e:
-                    print(f"Fallback failed: {e}")
-                    # Ultimate fallback - random sample
-                    if len(results_df) < n:
-                        sample = self.df.sample(n=min(5, len(self.df)))[['Book_ID', 'Title', 'Author', 'Genres']]
-                        for _, row in sample.iterrows():
-                            results_df = pd.concat([
-                                results_df,
-                                pd.DataFrame([{
-                                    'Book_ID': row['Book_ID'],
-                                    'Title': row['Title'],
-                                    'Author': row['Author'],
-                                    'Genres': row['Genres'],
-                                    'Type': 'emergency_fallback',
-                                    'Score': 0
-                                }])
-                            ], ignore_index=True)
-            
-            # Sort by type priority and score
-            type_order = {'content': 0, 'collaborative': 1, 'fallback': 2, 'emergency_fallback': 3}
-            results_df['type_rank'] = results_df['Type'].map(type_order)
-            results_df = results_df.sort_values(['type_rank', 'Score'], ascending=[True, False])
-            
-            return results_df.head(n).drop(columns=['type_rank'])
+            allowed = filter_mask(model, genre, user_id if exclude_seen else None)
+            if allowed is not None and not allowed.any():
+                # Unknown genre, or the user has read every book in it
+                return _empty_results(), True
+            parts, complete = engines.run(model, EngineRequest(user_id, book_id, n, allowed))
+            if not parts:
+                # Ultimate fallback - first catalog rows (that pass the filters)
+                rows = np.arange(len(model.df)) if allowed is None else np.flatnonzero(allowed)
+                parts.append((model.book_frame(rows[:5]), 'emergency_fallback', None))
+                complete = False
+            return _merge_results(parts, n), complete
 
         except Exception as e:
             print(f"Critical error in recommend(): {e}")
-            # Final safety net
-            return get_fallback_recommendations(n)
+            # Final safety net, with the usual columns; a filtered request gets nothing
+            # rather than books outside its filters
+            if genre is not None or exclude_seen:
+                return _empty_results(), False
+            return _merge_results([(get_fallback_recommendations(n, model=model), 'fallback', None)], n), False
     
+    def recommend_for_shelf(self, user_id, n=10, genre=None):
+        """Content recommendations for the user's reading list and reviews as a whole"""
+        model = model_holder.get()
+        return shelf_recommendations(user_id, n, model=model, allowed=filter_mask(model, genre))
+
+    def search(self, query, limit=5):
+        """Dataset rows whose title, author or genres match every word of `query`"""
+        model = model_holder.get()
+        return model.df.iloc[model.search_index.search(query, limit)]
+
+    def answer_question(self, question, context, timeout=None):
+        """Extractive answer from `context` via the shared QA model, or None if unavailable"""
+        service = get_qa_service()
+        if service is None:
+            return None
+        if timeout is None:
+            timeout = getattr(settings, 'RECOMMENDATION_QA_TIMEOUT', 5.0)
+        try:
+            return service.answer(question, context, timeout)['answer']
+        except QAUnavailable as e:
+            print(f"QA unavailable: {e}")
+            return None
+
     def answer_general(self, question):
         q = question.lower()
+        stats = model_holder.get().stats
         
         if "genre" in q:
-            all_genres = []
-            for genre_str in self.df['Genres'].dropna():
-                genres = re.split(r'[,|]', str(genre_str))
-                all_genres.extend([g.strip() for g in genres if g.strip()])
-            
-            genre_counts = pd.Series(all_genres).value_counts().head(5)
-            return "Top genres: " + ", ".join(genre_counts.index)
+            return "Top genres: " + ", ".join(stats.top_genres(5))
             
         elif "author" in q:
-            return "Top authors: " + ", ".join(self.df['Author'].value_counts().head(5).index)
+            return "Top authors: " + ", ".join(stats.top_authors(5))
             
         elif "rating" in q or "best" in q:
-            top = self.df.groupby('Title')['Rating'].mean().sort_values(ascending=False).head(5)
-            return "Top rated books: " + ", ".join(top.index)
+            return "Top rated books: " + ", ".join(stats.top_rated_titles(5))
             
         else:
             return "I can answer about genres, authors, ratings, or recommend books! Try asking for recommendations or info."
@@ -282,12 +486,7 @@ class HybridBookBot:
             if not query:
                 return "Please specify what you want to search for."
                 
-            mask = (
-                self.df['Title'].str.lower().str.contains(query, na=False) |
-                self.df['Author'].str.lower().str.contains(query, na=False) |
-                self.df['Genres'].str.lower().str.contains(query, na=False)
-            )
-            found = self.df[mask].head(5)
+            found = self.search(query, limit=5)
             
             if found.empty:
                 return f"No books found matching '{query}'."
@@ -297,10 +496,32 @@ class HybridBookBot:
         else:
             return self.answer_general(message)
 
-# Global bot instance for chatbot functionality
-bot = HybridBookBot()
+# Global bot instance for chatbot functionality, created on first use
+_bot = None
+_bot_lock = threading.Lock()
+
+def get_bot():
+    """Shared HybridBookBot, built on first use"""
+    global _bot
+    if _bot is None:
+        with _bot_lock:
+            if _bot is None:
+                _bot = HybridBookBot()
+    return _bot
+
+def warmup():
+    """Load the model and bot up front instead of on the first chatbot request"""
+    model = model_holder.get()
+    get_bot()
+    return model.version
+
+def __getattr__(name):
+    # Keeps `from .recommendation_model import bot` working without an eager load
+    if name == 'bot':
+        return get_bot()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Function for chatbot API
 def process_chat_message(message):
     """Process chat message and return response"""
-    return bot.chat(message)
+    return get_bot().chat(message)
@@ -0,0 +1,84 @@
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from .recommendation_artifacts import clean_text
+
+# Candidates checked for a literal phrase match when ranking results
+PHRASE_SCAN_LIMIT = 1000
+
+
+class TokenIndex:
+    """Inverted index over cleaned title, author and genre tokens.
+
+    Each token maps to a sorted posting list of dataset rows, stored CSR
+    style (postings[offsets[t]:offsets[t + 1]]) with the vocabulary kept
+    sorted so prefix lookups are a binary search. Queries are cleaned the
+    same way as the catalog and never interpreted as regular expressions.
+
+    Unlike the old substring scan, words match whole tokens and only the
+    last one also matches as a prefix: "hou" finds "House", "ouse" doesn't.
+    """
+
+    def __init__(self, df):
+        text = df['Clean_Title'] + ' ' + df['Clean_Author'] + ' ' + df['Clean_Genres']
+        tokens = text.str.split().explode().dropna()
+        tokens = tokens[tokens != '']
+        pairs = pd.DataFrame({'row': tokens.index.to_numpy(), 'token': tokens.to_numpy()}).drop_duplicates()
+
+        codes, vocabulary = pd.factorize(pairs['token'], sort=True)
+        rows = pairs['row'].to_numpy()
+        order = np.lexsort((rows, codes))
+        self.vocabulary = list(vocabulary)
+        self.postings = rows[order].astype(np.int32)
+        self.offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(self.vocabulary)), out=self.offsets[1:])
+
+        # Precomputed lowercase text for ranking literal phrase matches first
+        self.lower_text = (
+            df['Title'].astype(str).str.lower() + ' ' +
+            df['Author'].astype(str).str.lower() + ' ' +
+            df['Genres'].astype(str).str.lower()
+        ).to_numpy()
+
+    def _posting(self, term_index):
+        return self.postings[self.offsets[term_index]:self.offsets[term_index + 1]]
+
+    def rows_for_token(self, token):
+        i = bisect_left(self.vocabulary, token)
+        if i < len(self.vocabulary) and self.vocabulary[i] == token:
+            return self._posting(i)
+        return np.empty(0, dtype=np.int32)
+
+    def rows_for_prefix(self, prefix):
+        lo = bisect_left(self.vocabulary, prefix)
+        hi = bisect_left(self.vocabulary, prefix + '\U0010ffff')
+        if hi - lo == 1:
+            return self._posting(lo)
+        if hi == lo:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(self.postings[self.offsets[lo]:self.offsets[hi]])
+
+    def search(self, query, limit=5):
+        """Rows containing every query word (the last one as a prefix), best first"""
+        words = clean_text(query).split()
+        if not words:
+            return np.empty(0, dtype=np.int32)
+
+        # Rarest lists first keeps the intersections small
+        lists = [self.rows_for_token(word) for word in words[:-1]]
+        lists.append(self.rows_for_prefix(words[-1]))
+        lists.sort(key=len)
+        rows = lists[0]
+        for posting in lists[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, posting, assume_unique=True)
+
+        # Rows containing the query literally (like the old substring search) come first
+        phrase = str(query).lower().strip()
+        head = rows[:PHRASE_SCAN_LIMIT]
+        literal = np.fromiter((phrase in self.lower_text[row] for row in head), dtype=bool, count=len(head))
+        ranked = np.concatenate([head[literal], head[~literal], rows[PHRASE_SCAN_LIMIT:]])
+        return ranked[:limit]
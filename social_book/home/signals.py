@@ -0,0 +1,45 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cooccurrence import count_shelved_book, uncount_shelved_book
+from .models import Book, BookMapping, ReadingStatus, Review
+from .recommendation_cache import bump_user_generation
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_user_foldin(sender, instance, **kwargs):
+    """Reviews change the user's folded-in factor vector, shelf profile and cached results (all keyed by generation)"""
+    bump_user_generation(instance.user_id_id)
+
+
+@receiver([post_save, post_delete], sender=ReadingStatus)
+def invalidate_user_results(sender, instance, **kwargs):
+    """Shelf changes alter the shelf profile and which books are excluded as already read"""
+    bump_user_generation(instance.user_id)
+
+
+@receiver(post_save, sender=ReadingStatus)
+def count_shelved_pair(sender, instance, created, **kwargs):
+    """A newly shelved book pairs with the rest of the reading list; status changes don't"""
+    if created:
+        count_shelved_book(instance)
+
+
+@receiver(post_delete, sender=ReadingStatus)
+def uncount_shelved_pair(sender, instance, **kwargs):
+    """Also runs when the book, its author or the user is deleted"""
+    uncount_shelved_book(instance)
+
+
+@receiver(post_save, sender=Book)
+def refresh_book_mapping(sender, instance, **kwargs):
+    """Point dataset books with this title (and any it no longer matches) at the right Book"""
+    keys = {BookMapping.make_title_key(instance.book_name)}
+    keys.update(BookMapping.objects.filter(book=instance).values_list('title_key', flat=True))
+    BookMapping.refresh_titles(keys)
+
+
+@receiver(post_delete, sender=Book)
+def remap_deleted_book(sender, instance, **kwargs):
+    """Fall back to another Book with the same title, if any (mappings were set to NULL)"""
+    BookMapping.refresh_titles([BookMapping.make_title_key(instance.book_name)])
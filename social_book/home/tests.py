@@ -1,3 +1,668 @@
-from django.test import TestCase
+import copy
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from .catalog_stats import GenreMatrix, PopularityRanking
+from .content_index import IVFIndex, build_neighbor_table, extend_neighbor_table, recall_at_k
+from .cooccurrence import build_neighbor_lists
+from .models import Author, Book, BookCooccurrence, BookMapping, ReadingStatus, Review, UserRecommendation
+from .qa_service import QAUnavailable, QAWorker
+from .recommendation_artifacts import (
+    ModelHolder, RecommendationArtifacts, clean_text, live_books_frame, load_dataset, prune_bundles, read_ratings,
+)
+from .recommendation_cache import cache_stats, foldin_cache_key, results_cache, shelf_cache_key
+from .recommendation_engines import EngineRegistry, EngineRequest
+from .recommendation_model import (
+    RESULT_COLUMNS, HybridBookBot, content_based_recommendations, fold_in_user, item_knn_recommendations,
+    precomputed_recommendations, shelf_profile,
+)
+from .search_index import TokenIndex
+from .views import _site_recommendations
+
+WORDS = ['river', 'shadow', 'garden', 'night', 'crown', 'storm', 'island', 'winter', 'forest', 'glass']
+GENRES = ['Fantasy', 'Thriller', 'Romance', 'Poetry', 'History']
+
+
+def make_dataset(directory, n_books=60, n_users=40, seed=0):
+    """Write a small Final_Dataset.csv-shaped file; returns its catalog and raw rating rows, loaded like the real one"""
+    rng = np.random.default_rng(seed)
+    books = []
+    for i in range(n_books):
+        title = f"{WORDS[i % 10].title()} {WORDS[(i // 10 + 3) % 10].title()} {i}"
+        genres = '|'.join(sorted({GENRES[i % 5], GENRES[(i * 3 + 1) % 5]}))
+        books.append((10000000 + i, title, f"Author {i % 7}", genres))
+    rows = []
+    for user_id in range(1, n_users + 1):
+        for i in rng.choice(n_books, size=8, replace=False):
+            rows.append((user_id, *books[i][:1], int(rng.integers(1, 6)), *books[i][1:]))
+    path = os.path.join(directory, 'Final_Dataset.csv')
+    pd.DataFrame(rows, columns=['User_ID', 'Book_ID', 'Rating', 'Title', 'Author', 'Genres']).to_csv(path, index=False)
+    return load_dataset(path), read_ratings(path)
+
+
+def topic_matrix(n_rows=2000, n_features=400, n_topics=20, seed=0):
+    """L2-normalized sparse rows drawn mostly from one of `n_topics` word ranges"""
+    rng = np.random.default_rng(seed)
+    width = n_features // n_topics
+    rows, cols = [], []
+    for row, topic in enumerate(rng.integers(0, n_topics, n_rows)):
+        words = np.concatenate([topic * width + rng.integers(0, width, 8), rng.integers(0, n_features, 2)])
+        rows += [row] * len(words)
+        cols += words.tolist()
+    # Random weights, so exact search has no ties for the index to break differently
+    matrix = sparse.csr_matrix((rng.random(len(rows)), (rows, cols)), shape=(n_rows, n_features))
+    return normalize(matrix)
+
+
+class IVFIndexTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.matrix = topic_matrix()
+        cls.rows = np.arange(0, cls.matrix.shape[0], 20)
+
+    def test_recall_against_exact_search(self):
+        index = IVFIndex.build(self.matrix, n_probe=8)
+        self.assertGreaterEqual(recall_at_k(index, self.matrix, self.rows), 0.95)
+
+    def test_probing_every_cell_is_exact(self):
+        # search() caps n_probe at the number of cells
+        index = IVFIndex.build(self.matrix, n_probe=self.matrix.shape[0])
+        self.assertEqual(recall_at_k(index, self.matrix, self.rows), 1.0)
+
+    def test_round_trip_through_arrays(self):
+        index = IVFIndex.build(self.matrix, n_probe=4)
+        loaded = IVFIndex.from_arrays(self.matrix, index.to_arrays(), n_probe=4, rerank=True)
+        for row in self.rows[:10]:
+            expected, _ = index.search(self.matrix[row], 10)
+            found, _ = loaded.search(self.matrix[row], 10)
+            np.testing.assert_array_equal(found, expected)
+
+
+class NeighborTableTests(SimpleTestCase):
+    def test_extend_matches_rebuild(self):
+        matrix = topic_matrix(n_rows=600)
+        start = 500
+        idx, scores = build_neighbor_table(matrix[:start], k=10)
+        original = idx.copy()
+        # Small blocks, so new books also land in the lists of earlier new books
+        extended_idx, extended_scores = extend_neighbor_table(idx, scores, matrix, start=start, block_size=16)
+        rebuilt_idx, rebuilt_scores = build_neighbor_table(matrix, k=10)
+
+        np.testing.assert_allclose(extended_scores, rebuilt_scores, rtol=1e-6)
+        # Zero-score padding may name any row
+        matched = rebuilt_scores > 0
+        np.testing.assert_array_equal(extended_idx[matched], rebuilt_idx[matched])
+        # The inputs may be read-only maps, so they are left untouched
+        np.testing.assert_array_equal(idx, original)
+
+
+class TokenIndexTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.index = TokenIndex(live_books_frame([
+            (0, 'The House of Mirth', 'Edith Wharton', 'Fiction, Classics'),
+            (1, 'House of Leaves', 'Mark Danielewski', 'Horror'),
+            (2, 'Bleak House', 'Charles Dickens', 'Classics'),
+            (3, 'Edith Mirth Stories', 'Ann Lee', 'Humor'),
+        ]))
+
+    def search(self, query, limit=5):
+        return self.index.search(query, limit).tolist()
+
+    def test_every_word_must_match(self):
+        self.assertEqual(sorted(self.search('house classics')), [0, 2])
+        self.assertEqual(self.search('leaves dickens'), [])
+
+    def test_only_the_last_word_is_a_prefix(self):
+        self.assertEqual(sorted(self.search('hou')), [0, 1, 2])
+        self.assertEqual(self.search('hou classics'), [])
+        # Whole tokens, not substrings
+        self.assertEqual(self.search('ouse'), [])
+
+    def test_literal_phrase_ranks_first(self):
+        self.assertEqual(self.search('edith mirth'), [3, 0])
+
+    def test_regex_metacharacters_are_plain_text(self):
+        self.assertEqual(self.search('('), [])
+        self.assertEqual(sorted(self.search('bleak (')), [2])
+        self.assertEqual(sorted(self.search('mirth.*')), [0, 3])
+
+    def test_limit(self):
+        self.assertEqual(len(self.search('house', limit=2)), 2)
+
+
+@override_settings(
+    RECOMMENDATION_ENGINE_THREADS=2,
+    RECOMMENDATION_ENGINE_BUDGETS={'slow': 0.05, 'fast': 0.5},
+    RECOMMENDATION_DEADLINE=0.5,
+)
+class EngineBudgetTests(SimpleTestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.registry = EngineRegistry()
+
+        @self.registry.register('slow', 'slow')
+        def slow(model, request):
+            self.release.wait(5)
+            return pd.DataFrame({'Book_ID': [1]})
+
+        @self.registry.register('fast', 'fast')
+        def fast(model, request):
+            return pd.DataFrame({'Book_ID': [2]})
+
+        self.request = EngineRequest(user_id=1, book_id=None, n=1, allowed=None)
+
+    def test_late_engine_is_left_out(self):
+        parts, complete = self.registry.run(None, self.request)
+        self.assertFalse(complete)
+        self.assertEqual([kind for _, kind, _ in parts], ['fast'])
+        stats = self.registry.stats()
+        self.assertEqual(stats['slow']['timeouts'], 1)
+        self.assertEqual(stats['fast']['calls'], 1)
+
+    def test_saturated_pool_skips_engines(self):
+        self.registry.run(None, self.request)
+        # The first call's slow engine still holds a thread and this call's takes
+        # the other, so the fast engine isn't queued behind them
+        parts, complete = self.registry.run(None, self.request)
+        self.assertFalse(complete)
+        self.assertEqual(parts, [])
+        self.assertEqual(self.registry.stats()['fast']['skipped'], 1)
+
+        self.release.set()
+        self.registry._pool.shutdown(wait=True)
+        self.assertEqual(self.registry._in_flight, 0)
+
+    @override_settings(RECOMMENDATION_ENGINE_THREADS=0, RECOMMENDATION_DEADLINE=0.0)
+    def test_inline_engines_skipped_after_deadline(self):
+        parts, complete = self.registry.run(None, self.request)
+        self.assertFalse(complete)
+        self.assertEqual(parts, [])
+        self.assertEqual(self.registry.stats()['fast']['timeouts'], 1)
+
+
+class StubQAWorker(QAWorker):
+    """QAWorker whose pipeline sleeps for `slow` questions and blocks on `block` ones"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def _load_pipeline(self):
+        def pipeline(question, context):
+            self.started.set()
+            if question == 'block':
+                self.release.wait(5)
+            elif question == 'slow':
+                time.sleep(0.5)
+            return {'answer': context.split()[0], 'score': 1.0}
+        return pipeline
+
+
+class QAWorkerTests(SimpleTestCase):
+    def make_worker(self, **kwargs):
+        worker = StubQAWorker(**kwargs)
+        self.addCleanup(worker.release.set)
+        return worker
+
+    def block(self, worker):
+        """Occupy the worker thread with a question that never finishes"""
+        with self.assertRaisesMessage(QAUnavailable, 'timed out'):
+            worker.answer('block', 'x', timeout=0.05)
+        self.assertTrue(worker.started.wait(1))
+
+    def test_answers(self):
+        self.assertEqual(self.make_worker().answer('Who?', 'Dickens wrote it', timeout=1)['answer'], 'Dickens')
+
+    def test_full_queue(self):
+        worker = self.make_worker(max_queue=1)
+        self.block(worker)
+        with self.assertRaisesMessage(QAUnavailable, 'timed out'):
+            worker.answer('queued', 'x', timeout=0.05)  # stays queued behind the blocked one
+        with self.assertRaisesMessage(QAUnavailable, 'queue is full'):
+            worker.answer('rejected', 'x', timeout=0.05)
+
+    def test_timeout_covers_queueing_and_answering(self):
+        worker = self.make_worker(max_queue=1)
+        self.block(worker)
+        with self.assertRaisesMessage(QAUnavailable, 'timed out'):
+            worker.answer('queued', 'x', timeout=0.05)
+        # Space frees up partway through the timeout; only the rest is spent waiting for the answer
+        threading.Timer(0.25, worker.release.set).start()
+        started = time.monotonic()
+        with self.assertRaisesMessage(QAUnavailable, 'timed out'):
+            worker.answer('slow', 'x', timeout=0.35)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+class PopularityRankingTests(SimpleTestCase):
+    def ranking(self, rows, **kwargs):
+        df = pd.DataFrame(rows, columns=['Title', 'Rating_Mean', 'Rating_Count', 'Genres'])
+        return PopularityRanking(df, pd.factorize(df['Title'])[0], **kwargs)
+
+    def setUp(self):
+        self.popularity = self.ranking([
+            ('A', 4.0, 10, 'Crime|Thriller'),
+            ('B', 5.0, 1, 'Poetry'),
+            ('C', 4.5, 40, 'Crime, Mystery'),
+            ('A', 4.9, 2, 'Crime'),  # another edition of A
+            ('D', 3.0, 10, 'Thriller'),
+            ('E', 4.0, 10, None),
+        ])
+
+    def test_ranks_by_bayesian_score_once_per_title(self):
+        # A's editions share a title, E ties A and ranks after it
+        self.assertEqual(self.popularity.rows.tolist(), [2, 0, 5, 4, 1])
+        self.assertTrue((np.diff(self.popularity.scores) <= 0).all())
+
+    def test_genres_split_on_both_separators(self):
+        self.assertEqual(self.popularity.top(5, genre='crime').tolist(), [2, 0])
+        self.assertEqual(self.popularity.top(5, genre=' Mystery').tolist(), [2])
+        self.assertEqual(self.popularity.top(5, genre='Thriller').tolist(), [0, 4])
+        self.assertEqual(self.popularity.top(5, genre='nonexistent').tolist(), [])
+
+    def test_seed_rotation_is_stable(self):
+        popularity = self.ranking([(title, 4.0, count, 'Poetry') for title, count in zip('ABCDEF', range(60, 0, -10))],
+                                  rotation_window=2)
+        answers = {seed: popularity.top(2, seed=seed).tolist() for seed in range(4)}
+        # Seeds rotate the first 2 * 2 rows: [A, B, C, D] -> [B, C], [C, D], [D, A], ...
+        self.assertEqual(answers, {0: [0, 1], 1: [1, 2], 2: [2, 3], 3: [3, 0]})
+        self.assertEqual(popularity.top(2, seed=5).tolist(), answers[1])
+        self.assertEqual(popularity.top(2, genre='poetry', seed=2).tolist(), answers[2])
+
+    def test_catalog_without_ratings(self):
+        popularity = self.ranking([('A', 0.0, 0, 'Poetry'), ('B', 0.0, 0, 'Crime')])
+        self.assertTrue(np.isfinite(popularity.scores).all())
+        self.assertEqual(popularity.rows.tolist(), [0, 1])
+
+
+class RecommendationTestCase(TestCase):
+    """Fits one small model for the whole class"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dataset_dir = tempfile.mkdtemp()
+        df, ratings = make_dataset(cls.dataset_dir)
+        cls.model = RecommendationArtifacts.fit(df, ratings=ratings)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.dataset_dir)
+        super().tearDownClass()
+
+    def setUp(self):
+        for name in ('default', 'recommendations'):
+            caches[name].clear()
+
+
+class FoldInTests(RecommendationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='reader')
+        author = Author.objects.create(name='Author 0')
+        self.books = [
+            Book.objects.create(book_name=self.model.df['Title'].iat[row], author_id=author)
+            for row in range(3)
+        ]
+
+    def test_review_change_invalidates_shared_fold_in(self):
+        Review.objects.create(book_id=self.books[0], user_id=self.user, review_text='Good', rating=5)
+        _, rated, _ = fold_in_user(self.user.pk, model=self.model)
+        self.assertEqual(len(rated), 1)
+        # Stored in the shared results cache, not a per-process one
+        self.assertIsNotNone(results_cache().get(foldin_cache_key(self.user.pk, self.model.version)))
+
+        Review.objects.create(book_id=self.books[1], user_id=self.user, review_text='Fine', rating=3)
+        _, rated, values = fold_in_user(self.user.pk, model=self.model)
+        self.assertEqual(sorted(values.tolist()), [3.0, 5.0])
+
+        Review.objects.filter(user_id=self.user).delete()
+        self.assertIsNone(fold_in_user(self.user.pk, model=self.model))
+
+    def test_shelf_change_invalidates_shared_shelf_profile(self):
+        self.assertIsNone(shelf_profile(self.user.pk, model=self.model))
+        ReadingStatus.objects.create(user=self.user, book=self.books[0], status='read')
+        _, rows = shelf_profile(self.user.pk, model=self.model)
+        self.assertEqual(rows.tolist(), [0])
+        self.assertIsNotNone(results_cache().get(shelf_cache_key(self.user.pk, self.model.cache_version)))
+
+        ReadingStatus.objects.create(user=self.user, book=self.books[2], status='want_to_read')
+        _, rows = shelf_profile(self.user.pk, model=self.model)
+        self.assertEqual(sorted(rows.tolist()), [0, 2])
+
+
+class ContentRecommendationTests(RecommendationTestCase):
+    def reference(self, row, n):
+        """The original loop: full similarity row, best first, distinct titles above 0.1"""
+        sims = (self.model.tfidf_matrix @ self.model.tfidf_matrix[row].T).toarray().ravel()
+        seen = {clean_text(self.model.df['Title'].iat[row])}
+        ids, scores = [], []
+        for idx in np.argsort(-sims, kind='stable'):
+            if len(ids) >= n:
+                break
+            title = clean_text(self.model.df['Title'].iat[idx])
+            if idx != row and title not in seen and sims[idx] > 0.1:
+                seen.add(title)
+                ids.append(int(self.model.df['Book_ID'].iat[idx]))
+                scores.append(sims[idx])
+        return ids, np.array(scores)
+
+    def test_matches_original_loop(self):
+        for row in range(len(self.model.df)):
+            ids, scores = self.reference(row, 5)
+            result = content_based_recommendations(self.model.df['Book_ID'].iat[row], 5, model=self.model)
+            np.testing.assert_allclose(result['Similarity_Score'].to_numpy(), scores, rtol=1e-6)
+            # Books tied on the last score may be picked in either order
+            above = scores > scores[-1] + 1e-9
+            self.assertEqual(set(result['Book_ID'][above]), set(np.array(ids)[above]))
+
+
+class ItemKNNTests(RecommendationTestCase):
+    def rated_titles(self, user_id):
+        ratings = read_ratings(os.path.join(self.dataset_dir, 'Final_Dataset.csv'))
+        return set(ratings.loc[ratings['User_ID'] == user_id, 'Title'].astype(str))
+
+    def test_dataset_users_get_unrated_books(self):
+        # Each catalog book keeps one rating; the rest only exist as raw rows
+        self.assertEqual(self.model.user_item_matrix.nnz, len(self.model.df))
+        self.assertGreater(self.model.rating_matrix.nnz, len(self.model.df))
+        for user_id in self.model.rating_user_ids:
+            result = item_knn_recommendations(user_id, 5, model=self.model)
+            self.assertIsNotNone(result)
+            self.assertEqual(len(result), 5)
+            self.assertTrue((np.diff(result['Item_Score']) <= 0).all())
+            self.assertFalse(set(result['Title']) & self.rated_titles(user_id))
+
+    def test_allowed_rows(self):
+        allowed = self.model.genres.mask('Poetry')
+        result = item_knn_recommendations(1, 5, model=self.model, allowed=allowed)
+        for genres in result['Genres']:
+            self.assertIn('Poetry', genres.split('|'))
+
+
+@override_settings(RECOMMENDATION_ENGINE_THREADS=0)
+class FilterTests(RecommendationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bot = HybridBookBot()
+        self.book_id = int(self.model.df['Book_ID'].iat[0])
+
+    def genres_of(self, result):
+        return [set(genres.split('|')) for genres in result['Genres']]
+
+    def test_genre_filter(self):
+        result, complete = self.bot._recommend(self.model, None, self.book_id, 5, genre='poetry')
+        self.assertTrue(complete)
+        self.assertEqual(len(result), 5)
+        for genres in self.genres_of(result):
+            self.assertIn('Poetry', genres)
+
+    def test_unknown_genre_returns_no_books(self):
+        result, complete = self.bot._recommend(self.model, None, self.book_id, 5, genre='nonexistent')
+        self.assertTrue(complete)
+        self.assertTrue(result.empty)
+        self.assertEqual(list(result.columns), RESULT_COLUMNS)
+
+    def test_exclude_seen(self):
+        unfiltered, _ = self.bot._recommend(self.model, None, self.book_id, 5)
+        seen_title = unfiltered['Title'].iat[0]
+        user = User.objects.create(username='reader')
+        book = Book.objects.create(book_name=seen_title, author_id=Author.objects.create(name='Someone'))
+        ReadingStatus.objects.create(user=user, book=book, status='read')
+
+        result, _ = self.bot._recommend(self.model, user.pk, self.book_id, 5, exclude_seen=True)
+        self.assertEqual(len(result), 5)
+        self.assertNotIn(seen_title, result['Title'].tolist())
+
+    def test_genre_separators(self):
+        # Dataset rows use '|', site books commas
+        genres = GenreMatrix(pd.DataFrame({'Genres': ['Thriller|Crime', 'Thriller, Crime, Detective', None, 'Poetry']}))
+        np.testing.assert_array_equal(genres.mask('Thriller'), [True, True, False, False])
+        np.testing.assert_array_equal(genres.mask(' detective '), [False, True, False, False])
+
+
+@override_settings(RECOMMENDATION_ENGINE_THREADS=0)
+class RecommendCacheTests(RecommendationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bot = HybridBookBot()
+        self.book_id = int(self.model.df['Book_ID'].iat[0])
+        self.user = User.objects.create(username='reader')
+        self.computed = mock.patch.object(self.bot, '_recommend', wraps=self.bot._recommend).start()
+        self.served = mock.patch('home.recommendation_model.model_holder.get', return_value=self.model).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_second_call_is_a_hit(self):
+        first = self.bot.recommend(book_id=self.book_id, n=5)
+        second = self.bot.recommend(book_id=self.book_id, n=5)
+        self.assertEqual(self.computed.call_count, 1)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual((cache_stats()['hits'], cache_stats()['misses']), (1, 1))
+
+    def test_new_cache_version_misses(self):
+        self.bot.recommend(book_id=self.book_id, n=5)
+        swapped = copy.copy(self.model)
+        swapped.cache_version = f'{self.model.version}+live'
+        self.served.return_value = swapped
+        self.bot.recommend(book_id=self.book_id, n=5)
+        self.assertEqual(self.computed.call_count, 2)
+
+    def test_review_invalidates_the_users_results(self):
+        self.bot.recommend(user_id=self.user.pk, book_id=self.book_id, n=5)
+        self.bot.recommend(user_id=self.user.pk, book_id=self.book_id, n=5)
+        self.assertEqual(self.computed.call_count, 1)
+
+        book = Book.objects.create(book_name=self.model.df['Title'].iat[1], author_id=Author.objects.create(name='A'))
+        Review.objects.create(book_id=book, user_id=self.user, review_text='Good', rating=5)
+        self.bot.recommend(user_id=self.user.pk, book_id=self.book_id, n=5)
+        self.assertEqual(self.computed.call_count, 2)
+        # Anonymous results don't depend on the user
+        self.bot.recommend(book_id=self.book_id, n=5)
+        self.bot.recommend(book_id=self.book_id, n=5)
+        self.assertEqual(self.computed.call_count, 3)
+
+
+class ModelHolderTests(RecommendationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    @override_settings(RECOMMENDATION_ARTIFACTS_DIR='/nonexistent')
+    def test_hot_swaps_a_newer_bundle_from_its_root(self):
+        first = RecommendationArtifacts.fit(self.model.df.copy())
+        first.save(self.root)
+        holder = ModelHolder(root=self.root, poll_interval=0)
+        served = holder.get()
+        self.assertEqual(served.version, first.version)
+
+        second = RecommendationArtifacts.fit(self.model.df.copy())
+        second.save(self.root)
+        self.assertIs(holder.get(), served)  # the poll loads in the background
+        holder._loader.join(10)
+        self.assertEqual(holder.get().version, second.version)
+
+        # Requests still holding the old snapshot finish on it
+        book_id = served.df['Book_ID'].iat[0]
+        self.assertEqual(len(content_based_recommendations(book_id, 3, model=served)), 3)
+
+
+class LiveBundleTests(RecommendationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = tempfile.mkdtemp()
+        self.base = RecommendationArtifacts.fit(self.model.df.copy())
+        self.base.save(self.root)
+        self.records = [(1, 'Glass Harbour', 'New Writer', 'Poetry'), (2, 'Storm Garden', 'New Writer', 'Fantasy')]
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_saved_live_bundle_is_memory_mapped(self):
+        live = self.base.with_live_books(self.records)
+        live.save(self.root)
+
+        loaded = RecommendationArtifacts.load(self.root)
+        self.assertEqual(loaded.base_version, self.base.version)
+        self.assertEqual(loaded.cache_version, loaded.version)
+        self.assertEqual(loaded.live_records, self.records)
+        self.assertIsInstance(loaded.neighbor_idx, np.memmap)
+        self.assertEqual(loaded.df['Book_ID'].tolist()[-2:], [-1, -2])
+        np.testing.assert_array_equal(loaded.neighbor_idx, live.neighbor_idx)
+        # Unchanged files are shared with the base bundle, not rewritten
+        self.assertEqual(os.stat(os.path.join(self.root, loaded.version, 'user_factors.npy')).st_nlink, 2)
+
+    def test_appends_to_a_loaded_live_bundle(self):
+        self.base.with_live_books(self.records[:1]).save(self.root)
+        loaded = RecommendationArtifacts.load(self.root, with_base=True)
+        with self.assertRaises(ValueError):
+            RecommendationArtifacts.load(self.root).with_live_books(self.records)
+
+        appended = loaded.with_live_books(self.records)
+        self.assertEqual(appended.live_records, self.records)
+        self.assertEqual(len(appended.df), len(self.base.df) + 2)
+        # Dropping a site book rebuilds the live rows on the base bundle
+        rebuilt = appended.with_live_books(self.records[1:])
+        self.assertEqual(rebuilt.live_records, self.records[1:])
+        self.assertEqual(len(rebuilt.df), len(self.base.df) + 1)
+
+    def test_precomputed_rows_survive_live_syncs(self):
+        with override_settings(RECOMMENDATION_ARTIFACTS_DIR=self.root):
+            call_command('precompute_user_recommendations', stdout=io.StringIO())
+        self.base.with_live_books(self.records).save(self.root)
+
+        live = RecommendationArtifacts.load(self.root)
+        self.assertEqual(live.factor_version, self.base.version)
+        self.assertEqual(set(UserRecommendation.objects.values_list('model_version', flat=True)), {self.base.version})
+        self.assertEqual(len(precomputed_recommendations(live.user_ids[0], 5, model=live)), 5)
+
+    def test_pruning_keeps_the_base_of_the_current_bundle(self):
+        self.base.with_live_books(self.records[:1]).save(self.root)
+        RecommendationArtifacts.load(self.root, with_base=True).with_live_books(self.records).save(self.root)
+        prune_bundles(self.root, keep=1)
+        self.assertIsNotNone(RecommendationArtifacts.load(self.root, with_base=True).base)
+
+
+@mock.patch('home.cooccurrence.MAX_SHELF_PAIRS', 2)
+class CooccurrenceTests(TestCase):
+    def setUp(self):
+        self.authors = [Author.objects.create(name=f'Author {i}') for i in range(2)]
+        self.books = [
+            Book.objects.create(book_name=f'Book {i}', author_id=self.authors[i % 2]) for i in range(6)
+        ]
+        self.readers = [User.objects.create(username=f'reader{i}') for i in range(2)]
+
+    def shelve(self, user, books):
+        for book in books:
+            ReadingStatus.objects.create(user=user, book=book, status='read')
+
+    def lists(self):
+        return {row.book_id: row.neighbors for row in BookCooccurrence.objects.all() if row.neighbors}
+
+    def rebuilt(self):
+        return {pk: neighbors for pk, neighbors in build_neighbor_lists()[0].items() if neighbors}
+
+    def test_incremental_matches_rebuild(self):
+        self.shelve(self.readers[0], self.books[:5])
+        self.shelve(self.readers[1], self.books[2:])
+        self.assertEqual(self.lists(), self.rebuilt())
+        # Book 0 fell out of the window before book 3 was shelved
+        self.assertNotIn(self.books[3].pk, [pk for pk, _ in self.lists()[self.books[0].pk]])
+
+    def test_removal_takes_back_what_was_added(self):
+        self.shelve(self.readers[1], self.books[2:])
+        expected = self.lists()
+        self.shelve(self.readers[0], self.books[:5])
+        # Status changes don't count again
+        ReadingStatus.objects.filter(user=self.readers[0], book=self.books[1]).update(status='reading')
+        for i in (2, 0, 4, 1, 3):
+            ReadingStatus.objects.filter(user=self.readers[0], book=self.books[i]).delete()
+        self.assertEqual(self.lists(), expected)
+
+    def test_deleting_a_book_or_author(self):
+        for reader in self.readers:
+            self.shelve(reader, self.books[:4])
+        deleted = self.books[1]
+        deleted.delete()
+        self.assertNotIn(deleted.pk, self.lists())
+        self.assertNotIn(deleted.pk, [pk for neighbors in self.lists().values() for pk, _ in neighbors])
+        self.assertEqual(self.lists()[self.books[0].pk], [[self.books[2].pk, 2]])
+
+        self.authors[0].delete()
+        self.assertEqual(self.lists(), {})
+
+    def test_deleting_a_user(self):
+        self.shelve(self.readers[1], self.books[2:])
+        expected = self.lists()
+        self.shelve(self.readers[0], self.books[:5])
+        self.readers[0].delete()
+        self.assertEqual(self.lists(), expected)
+
+
+class BookMappingTests(TestCase):
+    def setUp(self):
+        self.author = Author.objects.create(name='Author')
+        self.dune = Book.objects.create(book_name='Dune', author_id=self.author)
+        BookMapping.objects.bulk_create([
+            BookMapping(dataset_book_id=1, title_key='dune', book=self.dune),
+            BookMapping(dataset_book_id=2, title_key='emma'),
+        ])
+
+    def mapped(self):
+        return dict(BookMapping.objects.values_list('dataset_book_id', 'book_id'))
+
+    def record(self, book_id, title):
+        return {'Book_ID': book_id, 'Title': title, 'Author': 'Author', 'Genres': 'Fiction'}
+
+    def test_rename_moves_the_mapping(self):
+        self.dune.book_name = 'EMMA'
+        self.dune.save()
+        self.assertEqual(self.mapped(), {1: None, 2: self.dune.pk})
+
+    def test_delete_falls_back_to_same_title(self):
+        other = Book.objects.create(book_name='dune', author_id=self.author)
+        self.assertEqual(self.mapped()[1], self.dune.pk)
+        self.dune.delete()
+        self.assertEqual(self.mapped()[1], other.pk)
+        other.delete()
+        self.assertEqual(self.mapped()[1], None)
+
+    def test_site_recommendations_in_one_query(self):
+        emma = Book.objects.create(book_name='Emma', author_id=self.author)
+        records = [self.record(2, 'Emma'), self.record(1, 'Dune'), self.record(2, 'Emma')]
+        with self.assertNumQueries(1):
+            books = _site_recommendations(records)
+        self.assertEqual([book['Book_ID'] for book in books], [emma.pk, self.dune.pk, emma.pk])
+
+    def test_unmapped_books_are_mapped_once(self):
+        persuasion = Book.objects.create(book_name='Persuasion', author_id=self.author)
+        records = [self.record(3, 'persuasion'), self.record(4, 'Nowhere'), self.record(-self.dune.pk, 'Dune')]
+        with self.assertLogs('home.views', 'WARNING'):
+            books = _site_recommendations(records)
+        self.assertEqual([book['Book_ID'] for book in books], [persuasion.pk, self.dune.pk])
+        self.assertEqual(self.mapped()[3], persuasion.pk)
+        self.assertIsNone(self.mapped()[4])
+        # The live book is a pk lookup, the dataset ones one mapping query
+        with self.assertNumQueries(2):
+            _site_recommendations(records)
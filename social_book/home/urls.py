@@ -17,6 +17,7 @@ urlpatterns = [
     path('author/<int:pk>/load-more-books/', views.load_more_books, name='load_more_books'),
     path('chatbot_page/', views.chatbot_page, name='chatbot_page'),
     path('chatbot/', views.chatbot, name='chatbot'),
+    path('recommendations/shelf/', views.shelf_recommendations, name='shelf_recommendations'),
     path("follow-author/", views.follow_author, name="follow-author"),
     path('api/search/', views.api_search, name='api_search'),
     path('trending/', views.trending_searches, name='trending_searches'),
@@ -33,6 +34,7 @@ urlpatterns = [
     path('myadmin/authors/', admin_views.admin_authors, name='admin_authors'),
     path('myadmin/users/', admin_views.admin_users, name='admin_users'),
     path('myadmin/back-to-site/', admin_views.back_to_site, name='back_to_site'),
+    path('myadmin/recommendation-stats/', admin_views.recommendation_stats, name='recommendation_stats'),
    
 ]
 
@@ -16,13 +16,11 @@ from datetime import datetime, timedelta
 from urllib.parse import unquote
 import json
 import csv
-import os
 import logging
-import pandas as pd
 from functools import wraps
 
-from .models import Cuser, Book, Author, Review, FollowAuthor, RecentSearch, ReadingStatus
-from .recommendation_model import bot, df
+from .models import Cuser, Book, Author, Review, FollowAuthor, RecentSearch, ReadingStatus, BookMapping
+from .cooccurrence import readers_also_shelved
 
 
 logger = logging.getLogger(__name__)
@@ -456,6 +454,7 @@ def book(request, pk):
         'reviews': reviews,
         'average_rating': book.average_rating(),
         'total_ratings': book.total_ratings(),
+        'also_shelved': readers_also_shelved(book.pk),
     }
 
     return render(request, 'book_profile.html', context)
@@ -529,17 +528,52 @@ def submit_review(request, book_id):
 
 
 
-# Load the recommendation model (your function or logic for recommendations)
-from .recommendation_model import content_based_recommendations
+def _site_recommendations(recommended_books):
+    """Recommendation records with dataset ids swapped for site Books (unmatched ones dropped)"""
+    # Dataset Book_ID -> site Book in one query (see build_book_mapping)
+    dataset_ids = [int(book['Book_ID']) for book in recommended_books]
+    mappings = BookMapping.objects.select_related('book').in_bulk(
+        [i for i in dataset_ids if i >= 0], field_name='dataset_book_id'
+    )
+    # Books added on the site since the last refit carry -pk (see sync_live_books)
+    live_books = Book.objects.in_bulk([-i for i in dataset_ids if i < 0])
+    # Not mapped yet (mapping never built for this dataset): match by title once and store it
+    unmapped = {i: book['Title'] for i, book in zip(dataset_ids, recommended_books) if i >= 0 and i not in mappings}
+    if unmapped:
+        logger.warning(f"{len(unmapped)} dataset books had no BookMapping; run 'manage.py build_book_mapping'")
+        new_mappings = BookMapping.map_titles(unmapped)
+
+    # Create a list to store recommendations with database IDs
+    final_recommendations = []
+
+    for book_id, book in zip(dataset_ids, recommended_books):
+        if book_id < 0:
+            db_book = live_books.get(-book_id)
+        elif book_id in mappings:
+            db_book = mappings[book_id].book
+        else:
+            db_book = new_mappings[book_id]
+        if db_book is None:
+            logger.warning(f"No match found in database for book: {book['Title']}")
+            continue
+        logger.info(f"Found match: Dataset title '{book['Title']}' -> DB book ID {db_book.pk}")
+        final_recommendations.append({
+            'Title': book['Title'],
+            'Author': book['Author'],
+            'Genres': book['Genres'],
+            'Book_ID': db_book.pk,  # Use the database book ID instead of dataset ID
+            'Image': db_book.image.url if db_book.image else None
+        })
+    return final_recommendations
 
-# Load the dataset once to use across requests
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-dataset_path = os.path.join(BASE_DIR, 'static', 'assets', 'dataset', 'Final_Dataset.csv')
-df = pd.read_csv(dataset_path)
 
 @csrf_exempt
 def chatbot(request):
     if request.method == 'POST':
+        # The ML stack is loaded on the first chatbot request, not at import time
+        from .recommendation_model import get_bot
+        bot = get_bot()
+
         # Parse user input
         data = json.loads(request.body.decode('utf-8'))
         user_input = data.get('query', '').strip().lower()
@@ -548,12 +582,8 @@ def chatbot(request):
         if not user_input:
             return JsonResponse({"response": "Please provide a book title or author name for recommendations."})
 
-        # Search in the dataset
-        filtered_books = df[
-            (df['Title'].str.lower().str.contains(user_input)) | 
-            (df['Author'].str.lower().str.contains(user_input))|
-            (df['Genres'].str.lower().str.contains(user_input))
-        ]
+        # Search in the dataset (inverted token index, query taken literally)
+        filtered_books = bot.search(user_input, limit=1)
         #print(f"Filtered Books: {filtered_books}")  # Debugging
 
         if filtered_books.empty:
@@ -564,44 +594,25 @@ def chatbot(request):
        # print(f"Selected Book ID: {book_id}")  # Debugging
 
         # recommendations = content_based_recommendations(book_id=book_id, n=5)
+        # Optional filters: {"genre": "Fantasy", "exclude_read": true}
+        genre = data.get('genre') or None
         if request.user.is_authenticated:
-            recommendations = bot.recommend(user_id=request.user.id, book_id=book_id, n=5)
+            recommendations = bot.recommend(user_id=request.user.id, book_id=book_id, n=5, genre=genre,
+                                            exclude_seen=bool(data.get('exclude_read')))
         else:
-            recommendations = bot.recommend(book_id=book_id, n=5)
+            recommendations = bot.recommend(book_id=book_id, n=5, genre=genre)
 
         # recommendations = bot.recommend(user_id=request.user.id, book_id=book_id, n=5)
         #recommendations = bot.recommend(book_id=book_id, n=5)
         #recommendations = bot.recommend(book_id=book_id, n=5)
         recommended_books = recommendations.to_dict(orient='records')
-        
-        # Create a list to store recommendations with database IDs
-        final_recommendations = []
-        
-        for book in recommended_books:
-            # Try to find the corresponding book in your database
-            try:
-                db_book = Book.objects.get(book_name__iexact=book['Title'])
-                logger.info(f"Found match: Dataset title '{book['Title']}' -> DB book ID {db_book.pk}")
-                final_recommendations.append({
-                    'Title': book['Title'],
-                    'Author': book['Author'],
-                    'Genres': book['Genres'],
-                    'Book_ID': db_book.pk,  # Use the database book ID instead of dataset ID
-                    'Image': db_book.image.url if db_book.image else None
-                })
-            except Book.DoesNotExist:
-                logger.warning(f"No match found in database for book: {book['Title']}")
-                continue
-            except Book.MultipleObjectsReturned:
-                # If multiple books found, use the first one
-                db_book = Book.objects.filter(book_name__iexact=book['Title']).first()
-                final_recommendations.append({
-                    'Title': book['Title'],
-                    'Author': book['Author'],
-                    'Genres': book['Genres'],
-                    'Book_ID': db_book.pk,
-                    'Image': db_book.image.url if db_book.image else None
-                })
+
+        final_recommendations = _site_recommendations(recommended_books)
+        if not final_recommendations and genre:
+            return JsonResponse({
+                "response": f"I couldn't find any books in the '{genre}' genre to recommend. Try another genre.",
+                "recommendations": []
+            })
 
         return JsonResponse({
             "response": f"Here are some book recommendations based on '{filtered_books.iloc[0]['Title']}' by {filtered_books.iloc[0]['Author']}:",
@@ -615,6 +626,24 @@ def chatbot(request):
 def chatbot_page(request):
     return render(request, 'chatbot.html')
 
+@user_login_required
+def shelf_recommendations(request):
+    """Content recommendations for the user's whole reading list, as JSON"""
+    # The ML stack is loaded on first use, not at import time
+    from .recommendation_model import get_bot
+    bot = get_bot()
+
+    try:
+        n = max(1, min(int(request.GET.get('n', 10)), 50))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'n must be a number'}, status=400)
+    recommendations = bot.recommend_for_shelf(request.user.id, n=n, genre=request.GET.get('genre') or None)
+
+    return JsonResponse({
+        'success': True,
+        'recommendations': _site_recommendations(recommendations.to_dict(orient='records')),
+    })
+
 
 @user_login_required
 @csrf_exempt  # If using AJAX requests without CSRF token
@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_book.settings')
 
 application = get_asgi_application()
+
+# Optionally load the recommendation model before the first request is served
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, 'RECOMMENDATION_WARMUP_ON_START', False):
+    from home.recommendation_model import warmup  # noqa: E402
+    warmup()
@@ -121,3 +121,55 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+
+# Prebuilt recommendation bundles written by `manage.py build_recommendation_artifacts`
+RECOMMENDATION_ARTIFACTS_DIR = os.path.join(BASE_DIR, 'artifacts', 'recommendation')
+# Seconds between checks for a newer bundle; workers hot-swap it in the background
+RECOMMENDATION_RELOAD_INTERVAL = 30
+# Share of new books' words missing from the fitted vocabulary above which
+# `manage.py sync_live_books --refit-on-drift` rebuilds the bundle
+RECOMMENDATION_DRIFT_THRESHOLD = 0.25
+# Memory-map bundle arrays read-only so all workers on a host share them
+RECOMMENDATION_MMAP = True
+# Load the recommendation model when the WSGI/ASGI app starts instead of on
+# the first chatbot request (management commands never load it)
+RECOMMENDATION_WARMUP_ON_START = False
+# Hybrid recommendations run the content, collaborative and item-item engines
+# on a small thread pool (0 runs them inline) and merge whatever finished within
+# each engine's budget (seconds) and the overall deadline; popularity fills the rest.
+# A late engine holds its thread until it returns and engines are skipped while
+# the pool is full, so allow 3 threads per request a worker serves concurrently
+RECOMMENDATION_ENGINE_THREADS = 12
+RECOMMENDATION_ENGINE_BUDGETS = {'content': 0.15, 'collaborative': 0.25, 'item_knn': 0.1}
+RECOMMENDATION_DEADLINE = 0.4
+
+# Finished recommendation lists are cached per (user, book, n, model version).
+# Point 'recommendations' at Redis or Memcached to share the cache (and its
+# hit/miss counters) across workers; entries are invalidated by key, so the
+# TTL only bounds how long unreachable ones linger.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'recommendations': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'recommendations',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Question answering with a transformers model is opt-in. When enabled, one
+# worker thread loads it on first use; set RECOMMENDATION_QA_ADDRESS (e.g.
+# ('127.0.0.1', 6010)) and run `manage.py run_qa_worker` to keep the model in
+# a single dedicated process shared by all web workers. The worker connection
+# unpickles what it receives, so it requires a secret RECOMMENDATION_QA_AUTHKEY
+# (read from the environment, never committed).
+RECOMMENDATION_QA_ENABLED = False
+RECOMMENDATION_QA_ADDRESS = None
+RECOMMENDATION_QA_AUTHKEY = os.environ.get('RECOMMENDATION_QA_AUTHKEY')
+RECOMMENDATION_QA_TIMEOUT = 5.0
+RECOMMENDATION_QA_QUEUE_SIZE = 32
+
+# Minimum number of ratings before a title is listed by the chatbot as top rated
+RECOMMENDATION_TOP_RATED_MIN_COUNT = 5